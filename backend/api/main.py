@@ -1,8 +1,12 @@
-from flask import Flask, jsonify, render_template, make_response
+from flask import Flask, Response, jsonify, render_template, make_response, request
 from flask_cors import CORS
+from flask.json.provider import DefaultJSONProvider
 from datetime import datetime, timedelta
+import json
 import logging
 import sys
+import threading
+import time
 from pathlib import Path
 import os
 from dotenv import load_dotenv
@@ -14,10 +18,18 @@ load_dotenv()
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 # Now import from backend
-from backend.api.services.tram_service import get_tram_departures
-from backend.api.services.bus_service import get_bus_departures, debug_logs
-from backend.api.services.connection_service import calculate_connections
+from backend.api.services.bus_service import REFRESHER_DEBUG_PATH, debug_logs
+from backend.api.services.debug_log import read_entries
 from backend.api.services.weather_service import weather_service
+from backend.api.services.config_service import DEFAULT_BOARD, config
+from backend.api.services.refresh_service import refresh_scheduler
+from backend.api.services.shared_snapshot import SharedSnapshotReader
+from backend.api.services.journey_service import SharedConnections, plan_journeys
+from backend.api.services.section_service import build_section, section_cache
+from backend.api.services.delta_service import build_delta, delta_cache, published_delta
+from backend.api.services.departures import json_default
+from backend.api.services import metrics
+from backend.api.services.quota import all_quotas
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -28,6 +40,77 @@ app = Flask(__name__,
 )
 CORS(app)
 
+class ModelJSONProvider(DefaultJSONProvider):
+    """JSON provider that also serializes the departure models"""
+    @staticmethod
+    def default(o):
+        try:
+            return json_default(o)
+        except TypeError:
+            return DefaultJSONProvider.default(o)
+
+app.json = ModelJSONProvider(app)
+
+# "standalone" refreshes upstream data in this process; "reader" (gunicorn
+# workers, see gunicorn.conf.py) serves what the refresher process publishes
+ROLE = os.getenv("MVG_ROLE", "standalone")
+snapshots = SharedSnapshotReader() if ROLE == "reader" else refresh_scheduler
+# Readers plan journeys from the refresher's connection index
+shared_connections = SharedConnections() if ROLE == "reader" else None
+
+def _unavailable():
+    return jsonify({"error": "Data not available yet"}), 503
+
+def _served_snapshot():
+    # Readers only pick up a newer snapshot when asked for one; a scrape must
+    # not start the scheduler, which publishes its snapshots itself
+    if ROLE == "reader":
+        return snapshots.get_snapshot()
+    return refresh_scheduler.current
+
+def _snapshot_age():
+    snapshot = _served_snapshot()
+    return time.monotonic() - snapshot.created_at if snapshot is not None else None
+
+def _snapshot_version():
+    snapshot = _served_snapshot()
+    return snapshot.version if snapshot is not None else None
+
+metrics.registry.register(metrics.Gauge(
+    "mvg_snapshot_age_seconds", "Seconds since the served snapshot was published",
+    function=_snapshot_age
+))
+metrics.registry.register(metrics.Gauge(
+    "mvg_snapshot_version", "Version of the served snapshot", function=_snapshot_version
+))
+
+# Seconds between dumps of a worker's metrics for the other workers' /metrics
+METRICS_DUMP_INTERVAL = 5
+
+def _dump_worker_metrics():
+    path = metrics.WORKER_METRICS_DIR / f"{os.getpid()}.json"
+    while True:
+        metrics.dump(path)
+        time.sleep(METRICS_DUMP_INTERVAL)
+
+if ROLE == "reader":
+    threading.Thread(target=_dump_worker_metrics, name="metrics-dump", daemon=True).start()
+
+@app.before_request
+def start_timer():
+    request.start_time = time.perf_counter()
+
+@app.after_request
+def record_timing(response):
+    start = getattr(request, 'start_time', None)
+    if start is not None:
+        metrics.http_request_seconds.observe(
+            time.perf_counter() - start,
+            endpoint=request.endpoint or 'unknown',
+            status=response.status_code
+        )
+    return response
+
 def add_cache_headers(response, max_age=15):
     """Add appropriate cache headers to response"""
     response.headers['Cache-Control'] = f'public, max-age={max_age}'
@@ -41,42 +124,264 @@ def home():
     response = make_response(render_template('index.html'))
     return add_cache_headers(response, max_age=3600)  # Cache HTML for 1 hour
 
+def _body_response(body):
+    """Serve a precomputed body, answering conditional GETs with 304
+
+    If-None-Match uses weak comparison (RFC 7232), so W/ ETags added by
+    proxies still match.
+    """
+    if request.if_none_match.contains_weak(body.etag):
+        response = Response(status=304)
+    else:
+        accepted = request.accept_encodings
+        if body.br is not None and accepted['br']:
+            response = Response(body.br, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'br'
+        elif accepted['gzip']:
+            response = Response(body.gzip, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(body.raw, mimetype='application/json')
+    response.set_etag(body.etag)
+    response.vary.add('Accept-Encoding')
+    return response
+
 @app.route('/api/data')
 def get_combined_data():
     """Get all transport data including connections and weather"""
     try:
-        # Get base data
-        trams = get_tram_departures()
-        buses = get_bus_departures()
-        weather = weather_service.get_weather()
+        # Upstream fetching happens in the background; this is a memory read
+        board = request.args.get('board', DEFAULT_BOARD)
+        snapshot = snapshots.get_snapshot()
+        if snapshot is None:
+            return _unavailable()
+        if board not in snapshot.bodies:
+            return jsonify({"error": f"Unknown board: {board}"}), 404
+        response = _body_response(snapshot.bodies[board])
+        return add_cache_headers(response, max_age=15)
         
-        # Calculate connections and update northbound trams
-        trams['northbound'] = calculate_connections(
-            northbound_trams=trams['northbound'],
-            buses=buses
+    except Exception as e:
+        logger.error(f"Error in combined data endpoint: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/api/data/delta')
+def get_data_delta():
+    """Departures added, changed or removed since the ?epoch=&since= version"""
+    try:
+        board = request.args.get('board', DEFAULT_BOARD)
+        since = request.args.get('since', type=int)
+        epoch = request.args.get('epoch', type=int)
+        snapshot = snapshots.get_snapshot()
+        if snapshot is None:
+            return _unavailable()
+        if board not in snapshot.data:
+            return jsonify({"error": f"Unknown board: {board}"}), 404
+        if snapshot.deltas is not None:
+            # Precomputed by the refresher for every version it still knows
+            body = published_delta(snapshot, board, since, epoch)
+        else:
+            body = delta_cache.get(
+                snapshot, (board, epoch, since),
+                lambda: build_delta(snapshots.history, snapshot, board, since, epoch)
+            )
+        return add_cache_headers(_body_response(body), max_age=15)
+
+    except Exception as e:
+        logger.error(f"Error in delta endpoint: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+def _section_response(section):
+    """Serve one section of a board, projected by ?fields= and ?limit="""
+    try:
+        board_name = request.args.get('board', DEFAULT_BOARD)
+        fields = tuple(
+            field for field in request.args.get('fields', '').split(',') if field
+        ) or None
+        limit = request.args.get('limit', type=int)
+        if limit is not None and limit < 0:
+            return jsonify({"error": "'limit' must not be negative"}), 400
+
+        snapshot = snapshots.get_snapshot()
+        if snapshot is None:
+            return _unavailable()
+        if board_name not in snapshot.data:
+            return jsonify({"error": f"Unknown board: {board_name}"}), 404
+
+        board = config.get_board(board_name)
+        body = section_cache.get(
+            snapshot, (board_name, section, fields, limit),
+            lambda: build_section(board, snapshot.data[board_name], section, fields, limit)
+        )
+        return add_cache_headers(_body_response(body), max_age=15)
+
+    except Exception as e:
+        logger.error(f"Error in {section} endpoint: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/api/trams')
+def get_trams():
+    """Tram departures per direction"""
+    return _section_response('trams')
+
+@app.route('/api/buses')
+def get_buses():
+    """Bus departures"""
+    return _section_response('buses')
+
+@app.route('/api/connections')
+def get_connections():
+    """Trams toward the transfer with their connecting buses"""
+    return _section_response('connections')
+
+@app.route('/api/weather')
+def get_weather():
+    """Current weather outlook"""
+    return _section_response('weather')
+
+# Seconds between heartbeat events on idle streams
+STREAM_HEARTBEAT = 15
+# Every open stream holds a server thread; the cap per process leaves the
+# other threads (half of gunicorn's by default) for polls and the polling
+# fallback clients switch to when a stream is refused
+MAX_STREAMS = int(os.getenv("MVG_MAX_STREAMS", int(os.getenv("MVG_THREADS", 8)) // 2))
+_stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+def _sse(event, data, event_id=None):
+    """Format one Server-Sent Event"""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'), default=json_default)}")
+    return "\n".join(lines) + "\n\n"
+
+def _event_id(snapshot):
+    """The epoch-qualified version, as used for delta cursors"""
+    return f"{snapshot.epoch}-{snapshot.version}"
+
+def _stream_board(board, snapshot):
+    """Yield the full board once, then only the sections that change"""
+    try:
+        yield from _stream_updates(board, snapshot)
+    finally:
+        # Runs once writing to a disconnected client failed, within a
+        # heartbeat or two, and the server closed the response
+        _stream_slots.release()
+
+def _stream_updates(board, snapshot):
+    yield _sse('snapshot', snapshot.data[board], _event_id(snapshot))
+    epoch, version = snapshot.epoch, snapshot.version
+    while True:
+        update = snapshots.wait_for_update(version, timeout=STREAM_HEARTBEAT, epoch=epoch)
+        if update is None:
+            latest = snapshots.get_snapshot()
+            yield _sse('heartbeat', {'lastUpdated': latest.data[board]['lastUpdated']})
+            continue
+
+        if update.epoch != epoch or update.version > version + 1:
+            # Missed intermediate versions or the refresher restarted;
+            # resend the whole board
+            yield _sse('snapshot', update.data[board], _event_id(update))
+        elif board in update.changes:
+            yield _sse('delta', {
+                **update.changes[board],
+                'lastUpdated': update.data[board]['lastUpdated']
+            }, _event_id(update))
+        epoch, version = update.epoch, update.version
+
+@app.route('/api/stream')
+def stream_data():
+    """Push board updates as Server-Sent Events"""
+    board = request.args.get('board', DEFAULT_BOARD)
+    snapshot = snapshots.get_snapshot()
+    if snapshot is None:
+        return _unavailable()
+    if board not in snapshot.data:
+        return jsonify({"error": f"Unknown board: {board}"}), 404
+    if not _stream_slots.acquire(blocking=False):
+        response = jsonify({"error": "Too many open streams, poll /api/data instead"})
+        response.headers['Retry-After'] = str(STREAM_HEARTBEAT)
+        return response, 503
+
+    response = Response(_stream_board(board, snapshot), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/journeys')
+def get_journeys():
+    """Plan earliest-arrival journeys between two configured stations"""
+    origin = request.args.get('from')
+    destination = request.args.get('to')
+    if not origin or not destination:
+        return jsonify({"error": "Both 'from' and 'to' are required"}), 400
+
+    try:
+        index = None
+        if shared_connections is not None:
+            index = shared_connections.get()
+            if index is None:
+                return _unavailable()
+        journeys = plan_journeys(
+            origin,
+            destination,
+            after=request.args.get('after', type=int),
+            count=request.args.get('count', default=3, type=int),
+            index=index
         )
-        
         response = make_response(jsonify({
-            'trams': trams,
-            'buses': buses,
-            'weather': weather,
+            'journeys': journeys,
             'lastUpdated': int(datetime.now().timestamp())
         }))
         return add_cache_headers(response, max_age=15)
-        
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        logger.error(f"Error in combined data endpoint: {str(e)}")
+        logger.error(f"Error in journeys endpoint: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus metrics for this process (and the refresher, under gunicorn)"""
+    # Budgets are shared between processes, so any of them can report them
+    for quota in all_quotas():
+        quota.remaining()
+    if ROLE != "reader":
+        return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+    # Any worker may get the scrape, so each reports every live worker
+    # (labelled by pid) and the refresher
+    pid = os.getpid()
+    extra = metrics.load(metrics.REFRESHER_METRICS_PATH, process="refresher")
+    extra += metrics.load_workers(exclude=pid)
+    return Response(
+        metrics.registry.render(extra, worker=str(pid)),
+        mimetype='text/plain; version=0.0.4'
+    )
+
 @app.route('/api/weather/debug')
 def weather_debug():
     """Debug endpoint for weather service"""
     try:
-        return jsonify({
-            "current_weather": weather_service.get_weather(),
-            "cache_time": weather_service.cache_time.isoformat() if weather_service.cache_time else None,
-            "cache_valid": weather_service._is_cache_valid()
-        })
+        # The weather as published; upstream is only asked by the refresher
+        snapshot = snapshots.get_snapshot()
+        if snapshot is None:
+            return _unavailable()
+        board = snapshot.data.get(request.args.get('board', DEFAULT_BOARD))
+        if board is None:
+            return jsonify({"error": "Unknown board"}), 404
+        result = {
+            "current_weather": board.get("weather"),
+            "stale": "weather" in board.get("stale", ()),
+            "snapshot_version": snapshot.version
+        }
+        if ROLE != "reader":
+            result["cache_time"] = (
+                weather_service.cache_time.isoformat() if weather_service.cache_time else None
+            )
+            result["cache_valid"] = weather_service._is_cache_valid()
+        return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -84,8 +389,10 @@ def weather_debug():
 def debug():
     """Debug endpoint for bus service"""
     try:
+        # Readers never fetch; the refresher's entries are the ones to show
+        logs = read_entries(REFRESHER_DEBUG_PATH) if ROLE == "reader" else list(debug_logs)
         return jsonify({
-            "logs": debug_logs,
+            "logs": logs,
             "timestamp": datetime.now().isoformat()
         })
     except Exception as e:
@@ -0,0 +1,63 @@
+"""Single refresher process for production serving.
+
+Fetches every upstream source on its schedule and publishes each new
+snapshot, and the journey planner's connection index, for the server
+workers (MVG_ROLE=reader) to read, so upstream traffic stays the same
+however many workers run.
+
+    python -m backend.api.refresher
+"""
+import logging
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from backend.api.services import metrics
+from backend.api.services.bus_service import REFRESHER_DEBUG_PATH, debug_log
+from backend.api.services.journey_service import CONNECTIONS_TTL, publish_connections
+from backend.api.services.refresh_service import refresh_scheduler
+from backend.api.services.shared_snapshot import SharedSnapshotWriter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds between metrics dumps for the workers' /metrics
+METRICS_INTERVAL = 5
+
+
+def main():
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    signal.signal(signal.SIGINT, lambda *_: stopped.set())
+
+    writer = SharedSnapshotWriter(history=refresh_scheduler.history)
+    refresh_scheduler.add_listener(writer.write)
+    # The supervisor in gunicorn.conf.py restarts the refresher once the
+    # scheduler stops ticking
+    refresh_scheduler.heartbeat = metrics.REFRESHER_HEARTBEAT_PATH
+    refresh_scheduler.start()
+    logger.info(f"Publishing snapshots to {writer.path}")
+
+    # Workers plan journeys from the index published here
+    publish_connections()
+    published_at = time.monotonic()
+    while not stopped.wait(METRICS_INTERVAL):
+        metrics.dump(metrics.REFRESHER_METRICS_PATH)
+        # Workers show these on /api/debug
+        debug_log.dump(REFRESHER_DEBUG_PATH)
+        if time.monotonic() - published_at >= CONNECTIONS_TTL:
+            publish_connections()
+            published_at = time.monotonic()
+    refresh_scheduler.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
-from mvg import MvgApi
 from datetime import datetime
 
+from backend.api.services.fetch_service import fetch_station_departures
+
 # Configuration
 ST_EMMERAM_ID = "de:09162:600"
 LINE_TO_FILTER = "189"
@@ -14,11 +15,9 @@ def fetch_live_departures_189():
         list: A list of departures with 'timestamp', 'line', 'destination', and 'minutes' fields.
     """
     try:
-        # Initialize the MVG API for St. Emmeram
-        mvg = MvgApi(ST_EMMERAM_ID)
-
-        # Fetch departures and filter for 189 toward Unterföhring
-        departures = mvg.departures()
+        # Fetch departures through the shared MVG connection pool (no
+        # per-call MvgApi station lookup) and filter for 189 toward Unterföhring
+        departures = fetch_station_departures(ST_EMMERAM_ID)
         filtered_departures = [
             {
                 "line": dep["line"],
@@ -10,6 +10,7 @@ if str(project_root) not in sys.path:
 
 # Now import the service
 from backend.api.services.bus_189_service import fetch_live_departures_189
+from backend.replay.upstream import ReplayUpstream
 
 def debug_print(label, data):
     """Helper function to print debug information."""
@@ -17,7 +18,7 @@ def debug_print(label, data):
     for item in data:
         print(item)
 
-def test_reconcile_departures():
+def reconcile_departures():
     """
     Fetch live data, generate hardcoded data, and reconcile the two
     with preference for live data when available.
@@ -66,13 +67,14 @@ def test_reconcile_departures():
         for live_dep in live_departures:
             live_time = live_dep["timestamp"]
             close_hardcoded = [
-                time for time in hardcoded_dict if is_close(live_time, time)
+                hardcoded_time for hardcoded_time in hardcoded_dict
+                if is_close(live_time, hardcoded_time)
             ]
 
             if close_hardcoded:
                 final_departures.append(live_dep)
-                for time in close_hardcoded:
-                    del hardcoded_dict[time]
+                for hardcoded_time in close_hardcoded:
+                    del hardcoded_dict[hardcoded_time]
             else:
                 final_departures.append(live_dep)
 
@@ -88,8 +90,17 @@ def test_reconcile_departures():
         print(f"Error during test reconciliation: {str(e)}")
         return {"buses": []}
 
+def test_reconcile_departures():
+    """Reconcile against recorded departures instead of the live API."""
+    with ReplayUpstream():
+        result = reconcile_departures()
+
+    timestamps = [dep["timestamp"] for dep in result["buses"]]
+    assert timestamps == sorted(timestamps)
+    assert any("minutes" in dep and dep["line"] == "189" for dep in result["buses"])
+
 if __name__ == "__main__":
     print("Running bus service test...")
-    result = test_reconcile_departures()
+    result = reconcile_departures()
     print("\n=== Final Output ===")
     print(result)
\ No newline at end of file
@@ -1,106 +1,143 @@
 import os
-from datetime import datetime, time, timedelta
-from zoneinfo import ZoneInfo
-from mvg import MvgApi
+from datetime import datetime
+from functools import partial
 from pathlib import Path
 
-# Constants
-ST_EMMERAM_ID = "de:09162:600"
-LINE_TO_FILTER = "189"
-DESTINATION_TO_FILTER = "Unterföhring"
+from backend.api.services.cache import TTLCache
+from backend.api.services.config_service import config
+from backend.api.services.debug_log import DebugLog
+from backend.api.services.delay_service import delay_history
+from backend.api.services.departures import Departure, DepartureTable
+from backend.api.services.fetch_service import fetch_station_departures
+from backend.api.services.snapshot_store import DATA_DIR
+from backend.api.services.timetable_service import timetable
+
+# Seconds live departures are served from cache, and how much longer a
+# stale result may be served while a single refresh runs in the background
+LIVE_CACHE_TTL = int(os.getenv("BUS_LIVE_CACHE_TTL", "60"))
+LIVE_CACHE_MAX_STALE = int(os.getenv("BUS_LIVE_CACHE_MAX_STALE", "600"))
+
+# Scheduled departures looked up per request (covers the next 24 hours)
+SCHEDULE_LIMIT = 50
+
+_live_cache = TTLCache(ttl=LIVE_CACHE_TTL, max_stale=LIVE_CACHE_MAX_STALE, name="bus_live")
 
 # Get the project root directory (3 levels up from this file)
 PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
 LOG_DIR = PROJECT_ROOT / "logs"
 LOG_FILE = "bus_service_debug.log"
+# Where the refresher process dumps its debug entries for the workers
+REFRESHER_DEBUG_PATH = DATA_DIR / "refresher-debug.json"
 
-debug_logs = []
+debug_log = DebugLog(LOG_DIR / LOG_FILE)
+# The last 100 debug messages, oldest first
+debug_logs = debug_log.entries
 
 def add_debug_log(message):
     """Add a message to the debug logs."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    debug_logs.append(f"{timestamp} - {message}")
-    # Keep only the last 100 logs
-    if len(debug_logs) > 100:
-        debug_logs.pop(0)
+    debug_log.add(message)
 
 def write_to_log(message):
-    """Ensure the log file exists and append debug information."""
-    try:
-        # Create logs directory if it doesn't exist
-        LOG_DIR.mkdir(exist_ok=True)
-        
-        log_path = LOG_DIR / LOG_FILE
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        print(f"Writing to log: {log_path}")  # Debug print
-        with open(log_path, "a") as f:
-            f.write(f"{timestamp} - {message}\n")
-            
-    except Exception as e:
-        print(f"Logging error: {str(e)}")  # Fallback to console
+    """Append debug information to the log file without blocking on disk."""
+    debug_log.write(message)
+
+def _query_live_departures(station_id):
+    """Query MVG departures for a station, bypassing the cache."""
+    return fetch_station_departures(station_id)
+
+def get_live_station_departures(station_id, max_age=None):
+    """Raw MVG departures for a station, served from the live cache.
+
+    ``max_age`` (seconds) forces a fetch when the cached departures are older.
+    """
+    return _live_cache.get(
+        station_id, partial(_query_live_departures, station_id), max_age=max_age
+    )
+
+def fetch_live_departures(bus_filter, max_age=None):
+    """Fetch live API departures matching the board's bus filter.
 
-def fetch_live_departures_189():
-    """Fetch live API departures for the 189 bus toward Unterföhring."""
+    Returns None when MVG could not be reached.
+    """
     try:
-        mvg = MvgApi(ST_EMMERAM_ID)
-        departures = mvg.departures()
-        
-        filtered_departures = []
         current_time = int(datetime.now().timestamp())
         
-        for dep in departures:
-            if dep.get("line") == "189" and "unterföhring" in dep.get("destination", "").lower():
+        filtered_departures = []
+        for station_id in bus_filter.station_ids:
+            departures = get_live_station_departures(station_id, max_age)
+            
+            for dep in departures:
+                if bus_filter.classify(dep) is None:
+                    continue
+                
                 planned_time = dep.get("planned", 0)
                 actual_time = dep.get("time", planned_time)
+                delay_history.observe(
+                    dep.get("line"), bus_filter.station.key, planned_time, actual_time
+                )
                 
-                minutes = int((actual_time - current_time) // 60)
-                
-                if minutes >= 0:
-                    filtered_departures.append({
-                        "line": "189",
-                        "destination": "Unterföhring",
-                        "timestamp": actual_time,
-                        "minutes": minutes,
-                        "is_live": True,
-                        "delay": actual_time - planned_time
-                    })
+                if actual_time >= current_time:
+                    filtered_departures.append(Departure(
+                        line=dep.get("line"),
+                        destination=bus_filter.destination or dep.get("destination"),
+                        timestamp=actual_time,
+                        is_live=True,
+                        delay=actual_time - planned_time
+                    ))
         
+        delay_history.settle()
         return filtered_departures
 
     except Exception as e:
         print(f"Error fetching live data: {str(e)}")
-        return []
+        add_debug_log(f"Error fetching live data: {str(e)}")
+        write_to_log(f"Error fetching live data: {str(e)}")
+        return None
 
-def get_bus_departures():
-    """Generate the schedule for bus 189 to Unterföhring."""
+def get_scheduled_departures(bus_filter, current_timestamp):
+    """Next scheduled departures from the timetable for the board's bus."""
+    patterns = [
+        pattern for pattern in timetable.patterns(bus_filter.station.key)
+        if bus_filter.classify_key(pattern.type, pattern.line, pattern.destination)
+    ]
+    
+    scheduled_departures = []
+    for timestamp, pattern in timetable.next_departures(
+        patterns, current_timestamp, limit=SCHEDULE_LIMIT
+    ):
+        # Shift the planned time by the delay this line usually has then
+        predicted_delay = int(round(
+            delay_history.predict(pattern.line, bus_filter.station.key, timestamp)[0]
+        ))
+        scheduled_departures.append(Departure(
+            line=pattern.line,
+            destination=bus_filter.destination or pattern.destination,
+            timestamp=timestamp + predicted_delay,
+            is_live=False,
+            delay=predicted_delay
+        ))
+    
+    return scheduled_departures
+
+def get_bus_departures(board_name=None, max_age=None):
+    """Combine live and scheduled departures for the board's bus line.
+
+    Returns the departures as a DepartureTable under "buses". ``max_age``
+    (seconds) bounds how old the cached live departures may be. Returns
+    None when the live departures could not be fetched, so callers keep
+    serving their last good departures.
+    """
     try:
+        bus_filter = config.get_board(board_name).buses
         current_timestamp = int(datetime.now().timestamp())
         
         # Get live data first
-        live_departures = fetch_live_departures_189()
+        live_departures = fetch_live_departures(bus_filter, max_age)
+        if live_departures is None:
+            return None
         
-        # Generate hardcoded schedule
-        hardcoded_departures = []
-        if datetime.now().weekday() < 5:  # Monday-Friday only
-            start_time = time(6, 8)
-            end_time = time(20, 28)
-            current_time = start_time
-            
-            while current_time <= end_time:
-                departure_time = datetime.combine(datetime.now().date(), current_time)
-                timestamp = int(departure_time.timestamp())
-                
-                if timestamp > current_timestamp:
-                    hardcoded_departures.append({
-                        "line": "189",
-                        "destination": "Unterföhring",
-                        "timestamp": timestamp,
-                        "minutes": int((timestamp - current_timestamp) // 60),
-                        "is_live": False
-                    })
-                current_time = (datetime.combine(datetime.now().date(), current_time) 
-                              + timedelta(minutes=20)).time()
+        # Scheduled fallback from the configured timetable
+        hardcoded_departures = get_scheduled_departures(bus_filter, current_timestamp)
         
         # Combine departures
         final_departures = []
@@ -110,18 +147,27 @@ def get_bus_departures():
             final_departures.extend(live_departures)
             
             # Only add scheduled departures that are at least 10 minutes after last live departure
-            last_live_time = max(dep["timestamp"] for dep in live_departures)
+            last_live_time = max(dep.timestamp for dep in live_departures)
             future_hardcoded = [
                 dep for dep in hardcoded_departures 
-                if dep["timestamp"] > (last_live_time + 600)  # 10 minutes
+                if dep.timestamp > (last_live_time + 600)  # 10 minutes
             ]
             final_departures.extend(future_hardcoded)
         else:
             final_departures.extend(hardcoded_departures)
         
-        final_departures.sort(key=lambda x: x["timestamp"])
-        return {"buses": final_departures}
+        return {"buses": DepartureTable.from_departures(final_departures)}
         
     except Exception as e:
         print(f"Error generating bus schedule: {str(e)}")
-        return {"buses": []}
\ No newline at end of file
+        add_debug_log(f"Error generating bus schedule: {str(e)}")
+        write_to_log(f"Error generating bus schedule: {str(e)}")
+        return None
+
+def get_scheduled_bus_departures(board_name=None):
+    """Timetable departures only, for when no live departures arrived yet."""
+    bus_filter = config.get_board(board_name).buses
+    current_timestamp = int(datetime.now().timestamp())
+    return {"buses": DepartureTable.from_departures(
+        get_scheduled_departures(bus_filter, current_timestamp)
+    )}
\ No newline at end of file
@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from backend.api.services.metrics import cache_requests
+
+logger = logging.getLogger(__name__)
+
+CacheEntry = namedtuple("CacheEntry", ["value", "fetched_at"])
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class TTLCache:
+    """Keyed cache with a TTL, stale-while-revalidate and single-flight loads.
+
+    - Within ``ttl`` seconds of a fetch the cached value is returned as is.
+    - Past the TTL, but within ``max_stale`` further seconds, the stale value
+      is returned immediately and one background refresh is started.
+    - Without a usable value the caller loads it; concurrent callers for the
+      same key share that one load.
+
+    Failed loads are never cached, so the last good value keeps being served
+    while the upstream recovers. A ``name`` labels the cache's hit, miss and
+    stale counts in the metrics.
+    """
+
+    def __init__(self, ttl, max_stale=None, name=None):
+        self.ttl = ttl
+        self.name = name
+        self.max_stale = max_stale
+        self._entries = {}
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+    def get(self, key, loader, max_age=None):
+        """Return the value for ``key``, calling ``loader()`` when needed.
+
+        With ``max_age``, an entry older than that is reloaded before
+        returning rather than served stale, and a failed reload raises.
+        """
+        entry = self._entries.get(key)
+        if max_age is not None:
+            if entry is not None and time.monotonic() - entry.fetched_at < max_age:
+                self._count("hit")
+                return entry.value
+            self._count("miss")
+            return self._load(key, loader)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age < self.ttl:
+                self._count("hit")
+                return entry.value
+            if self.max_stale is None or age < self.ttl + self.max_stale:
+                self._count("stale")
+                self._refresh_in_background(key, loader)
+                return entry.value
+        self._count("miss")
+        return self._load(key, loader)
+
+    def _count(self, result):
+        if self.name is not None:
+            cache_requests.inc(cache=self.name, result=result)
+
+    def peek(self, key):
+        """Return the cached entry for ``key`` without loading, or None."""
+        return self._entries.get(key)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def _load(self, key, loader):
+        def load_and_store():
+            value = loader()
+            self._entries[key] = CacheEntry(value, time.monotonic())
+            return value
+
+        return self._flight.do(key, load_and_store)
+
+    def _refresh_in_background(self, key, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._load(key, loader)
+            except Exception as e:
+                logger.error(f"Background refresh of {key!r} failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name="cache-refresh", daemon=True).start()
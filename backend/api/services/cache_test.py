@@ -0,0 +1,77 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).resolve().parents[3]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.api.services.cache import TTLCache
+
+
+def test_fresh_value_is_served_from_cache():
+    cache = TTLCache(ttl=60)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get("k", loader) == 1
+    assert cache.get("k", loader) == 1
+    assert len(calls) == 1
+
+
+def test_stale_value_is_served_while_one_refresh_runs():
+    cache = TTLCache(ttl=0, max_stale=60)
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        if len(calls) > 1:
+            release.wait(5)
+        return len(calls)
+
+    assert cache.get("k", loader) == 1
+    # Both reads return the stale value straight away; only one refresh starts
+    assert cache.get("k", loader) == 1
+    assert cache.get("k", loader) == 1
+    release.set()
+
+    deadline = time.monotonic() + 5
+    while cache.peek("k").value != 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.peek("k").value == 2
+    assert len(calls) == 2
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache(ttl=60)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def loader():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get("k", loader)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ["value"] * 8
+    assert len(calls) == 1
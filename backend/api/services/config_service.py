@@ -0,0 +1,238 @@
+import os
+from collections import namedtuple
+from pathlib import Path
+
+import yaml
+
+DEFAULT_CONFIG_PATH = Path(__file__).parent.parent.parent / "config" / "boards.yaml"
+DEFAULT_BOARD = "default"
+
+# Classification memo entries kept per filter before it is reset
+MAX_MEMO_SIZE = 4096
+
+Station = namedtuple("Station", ["key", "name", "ids", "change_seconds"])
+Transfer = namedtuple("Transfer", ["from_direction", "ride_minutes", "walk_minutes"])
+
+
+def _lower_all(values):
+    return tuple(value.lower() for value in values or ())
+
+
+class DirectionRule:
+    """A named rule matching departures by line and destination."""
+
+    __slots__ = ("name", "lines", "destination_contains")
+
+    def __init__(self, name, lines=None, destination_contains=None):
+        self.name = name
+        self.lines = frozenset(str(line) for line in lines) if lines else None
+        self.destination_contains = _lower_all(destination_contains)
+
+    def matches(self, line, destination):
+        if self.lines is not None and line not in self.lines:
+            return False
+        if self.destination_contains:
+            destination = destination.lower()
+            return any(part in destination for part in self.destination_contains)
+        return True
+
+
+class DepartureFilter:
+    """Compiled filter assigning station departures to board directions.
+
+    Rules are evaluated once per distinct (type, line, destination); the
+    result is memoised so every later departure is classified with a single
+    dict lookup.
+    """
+
+    def __init__(self, station, directions, types=None, lines=None,
+                 limit=None, destination=None):
+        self.station = station
+        self.directions = directions
+        self.direction_names = tuple(rule.name for rule in directions)
+        self.types = frozenset(types) if types else None
+        self.lines = frozenset(str(line) for line in lines) if lines else None
+        self.limit = limit
+        self.destination = destination
+        self._memo = {}
+
+    @property
+    def station_ids(self):
+        return self.station.ids
+
+    def classify(self, dep):
+        """Return the direction name for an MVG departure, or None to drop it."""
+        return self.classify_key(
+            dep.get("type"), dep.get("line"), dep.get("destination", "")
+        )
+
+    def classify_key(self, dep_type, line, destination):
+        """Return the direction name for a (type, line, destination) triple."""
+        key = (dep_type, line, destination)
+        try:
+            return self._memo[key]
+        except KeyError:
+            pass
+
+        direction = self._evaluate(*key)
+        if len(self._memo) >= MAX_MEMO_SIZE:
+            self._memo.clear()
+        self._memo[key] = direction
+        return direction
+
+    def _evaluate(self, dep_type, line, destination):
+        if self.types is not None and dep_type not in self.types:
+            return None
+        if self.lines is not None and line not in self.lines:
+            return None
+        for rule in self.directions:
+            if rule.matches(line, destination):
+                return rule.name
+        return None
+
+
+Board = namedtuple("Board", ["name", "trams", "buses", "transfer"])
+
+# A ride from one station to another, matching departures at ``station``
+RideLeg = namedtuple("RideLeg", ["station", "to", "seconds", "filter"])
+
+
+class Network:
+    """Precomputed stop/transfer graph for journey planning."""
+
+    def __init__(self, stations, rides, walks):
+        self.stations = stations
+        # station key -> [RideLeg] departing there
+        self.rides = rides
+        # station key -> [(to station key, walking seconds)]
+        self.walks = walks
+
+    def change_seconds(self, station):
+        return self.stations[station].change_seconds
+
+
+class Config:
+    """Compiled deployment configuration."""
+
+    def __init__(self, stations, boards, network):
+        self.stations = stations
+        self.boards = boards
+        self.network = network
+
+    def get_board(self, name=None):
+        """Return the named board (the default board when ``name`` is None)."""
+        try:
+            return self.boards[name or DEFAULT_BOARD]
+        except KeyError:
+            raise KeyError(f"Unknown board: {name}")
+
+    def station_ids(self):
+        """All station ids used by any board."""
+        ids = []
+        for board in self.boards.values():
+            for section in (board.trams, board.buses):
+                ids.extend(section.station_ids)
+        return list(dict.fromkeys(ids))
+
+
+def _compile_filter(section, stations, where):
+    try:
+        station = stations[section["station"]]
+    except KeyError:
+        raise ValueError(f"{where}: unknown or missing station")
+
+    directions = [
+        DirectionRule(name, **(rule or {}))
+        for name, rule in (section.get("directions") or {}).items()
+    ]
+    if not directions:
+        raise ValueError(f"{where}: at least one direction is required")
+
+    return DepartureFilter(
+        station=station,
+        directions=directions,
+        types=section.get("types"),
+        lines=section.get("lines"),
+        limit=section.get("limit"),
+        destination=section.get("destination")
+    )
+
+
+def _compile_network(raw, stations):
+    rides = {}
+    for index, ride in enumerate(raw.get("rides") or ()):
+        where = f"network ride {index + 1}"
+        if ride.get("to") not in stations:
+            raise ValueError(f"{where}: unknown or missing destination station")
+        leg_filter = _compile_filter(
+            {
+                "station": ride.get("from"),
+                "types": ride.get("types"),
+                "lines": ride.get("lines"),
+                "directions": {
+                    ride["to"]: {"destination_contains": ride.get("destination_contains")}
+                }
+            },
+            stations,
+            where
+        )
+        leg = RideLeg(leg_filter.station.key, ride["to"], int(ride["minutes"]) * 60, leg_filter)
+        rides.setdefault(leg.station, []).append(leg)
+
+    walks = {}
+    for walk in raw.get("walks") or ():
+        if walk.get("from") not in stations or walk.get("to") not in stations:
+            raise ValueError("network walk: unknown station")
+        seconds = int(walk["minutes"]) * 60
+        walks.setdefault(walk["from"], []).append((walk["to"], seconds))
+        # Walks go both ways unless marked otherwise
+        if walk.get("bidirectional", True):
+            walks.setdefault(walk["to"], []).append((walk["from"], seconds))
+
+    return Network(stations, rides, walks)
+
+
+def compile_config(raw):
+    """Compile a parsed configuration dict into lookup structures."""
+    network = raw.get("network") or {}
+    default_change = network.get("change_minutes", 1)
+    stations = {
+        key: Station(
+            key,
+            value.get("name", key),
+            tuple(value.get("ids") or ()),
+            int(value.get("change_minutes", default_change)) * 60
+        )
+        for key, value in (raw.get("stations") or {}).items()
+    }
+
+    boards = {}
+    for name, board in (raw.get("boards") or {}).items():
+        trams = _compile_filter(board["trams"], stations, f"board {name} trams")
+        buses = _compile_filter(board["buses"], stations, f"board {name} buses")
+
+        transfer = board.get("transfer") or {}
+        transfer = Transfer(
+            from_direction=transfer.get("from", trams.direction_names[0]),
+            ride_minutes=transfer.get("ride_minutes", 0),
+            walk_minutes=transfer.get("walk_minutes", 0)
+        )
+        if transfer.from_direction not in trams.direction_names:
+            raise ValueError(f"board {name}: transfer from unknown direction")
+
+        boards[name] = Board(name, trams, buses, transfer)
+
+    if DEFAULT_BOARD not in boards:
+        raise ValueError(f"Configuration must define a '{DEFAULT_BOARD}' board")
+
+    return Config(stations, boards, _compile_network(network, stations))
+
+
+def load_config(path=None):
+    """Load and compile the configuration file."""
+    path = Path(path or os.getenv("MVG_CONFIG", DEFAULT_CONFIG_PATH))
+    with open(path, encoding="utf-8") as f:
+        return compile_config(yaml.safe_load(f) or {})
+
+
+config = load_config()
@@ -1,85 +1,144 @@
-from datetime import datetime
 import logging
+import math
 
-def calculate_connections(northbound_trams, buses):
+from backend.api.services.config_service import config
+from backend.api.services.delay_service import connection_probability, delay_history
+from backend.api.services.departures import Connection
+from backend.api.services.metrics import connections_seconds
+
+# Transfer options reported per tram (the first one is the recommended bus)
+MAX_OPTIONS = 3
+# Buses leaving more than this long (seconds) after the earliest boarding are
+# not offered, so late trams are not matched to the next morning's bus
+MAX_WAIT = 3600
+
+# Slack (seconds between earliest possible boarding and bus departure) below
+# which a connection is at high / medium risk of being missed
+HIGH_RISK_SLACK = 60
+MEDIUM_RISK_SLACK = 180
+# A tram already this late (seconds) tends to lose more time before the transfer
+LATE_TRAM_DELAY = 120
+
+RISK_LEVELS = ("low", "medium", "high")
+# Share of a line's historical delay spread still uncertain once a departure
+# is tracked live
+LIVE_SPREAD_FACTOR = 0.5
+
+
+def _risk(slack, tram_delay):
+    """Missed-connection risk from the transfer slack and the tram's delay."""
+    if slack < HIGH_RISK_SLACK:
+        level = 2
+    elif slack < MEDIUM_RISK_SLACK:
+        level = 1
+    else:
+        level = 0
+    if (tram_delay or 0) >= LATE_TRAM_DELAY:
+        level = min(level + 1, 2)
+    return RISK_LEVELS[level]
+
+
+def _spread(departure, station, delays):
+    spread = delays.spread(departure.line, station, departure.timestamp)
+    return spread * LIVE_SPREAD_FACTOR if departure.is_live else spread
+
+
+def calculate_connections(northbound_trams, buses, transfer=None, max_options=MAX_OPTIONS,
+                          tram_station=None, bus_station=None, delays=delay_history,
+                          max_wait=MAX_WAIT):
     """
     Calculate connection possibilities between northbound trams and the 189 bus.
     For each tram, we try to find the earliest bus departing at or after
     tram arrival + walk time, preferring live over scheduled if both are valid.
+    The ride and walk times come from the board's configured transfer leg.
+
+    Trams are swept in departure order against the time-sorted live and
+    scheduled buses with one forward-only pointer each, so the whole board
+    is matched in linear time. Returns new Departures carrying up to
+    ``max_options`` Connections (the first is the recommended bus), only
+    for buses within ``max_wait`` seconds of the earliest boarding; the
+    input trams are left untouched.
+
+    Each Connection also carries its reliability: the probability of
+    making the bus given how much the tram and bus lines' delays have
+    varied at the transfer stations (``tram_station`` and ``bus_station``).
     """
+    with connections_seconds.time():
+        return _calculate_connections(
+            northbound_trams, buses, transfer, max_options, tram_station, bus_station,
+            delays, max_wait
+        )
+
+
+def _calculate_connections(northbound_trams, buses, transfer, max_options,
+                           tram_station, bus_station, delays, max_wait):
     try:
-        # Minutes from Prinz-Eugen-Park to St. Emmeram
-        TRAM_TO_SE_TIME = 4
-        # Minutes to walk from the tram stop to the bus stop
-        TRAM_TO_BUS_WALK_TIME = 1
+        if transfer is None:
+            transfer = config.get_board().transfer
+        ride_seconds = transfer.ride_minutes * 60
+        walk_seconds = transfer.walk_minutes * 60
 
-        # All bus departures from the 'buses' dictionary
+        # Separate buses into "live" vs "scheduled" for preference
         bus_departures = buses.get('buses', [])
+        live_buses = sorted(
+            (b for b in bus_departures if b.is_live),
+            key=lambda x: x.timestamp
+        )
+        scheduled_buses = sorted(
+            (b for b in bus_departures if not b.is_live),
+            key=lambda x: x.timestamp
+        )
 
-        # Separate them into "live" vs "scheduled" for preference
-        live_buses = [b for b in bus_departures if b.get('is_live', False)]
-        scheduled_buses = [b for b in bus_departures if not b.get('is_live', False)]
-
-        # Sort them by timestamp just so we can debug in ascending order
-        live_buses.sort(key=lambda x: x['timestamp'])
-        scheduled_buses.sort(key=lambda x: x['timestamp'])
-
-        logging.debug("=== calculate_connections Debug ===")
-        logging.debug("live_buses: %s", live_buses)
-        logging.debug("scheduled_buses: %s", scheduled_buses)
-
-        for tram in northbound_trams:
-            # The tram arrives at St. Emmeram (SE) in TRAM_TO_SE_TIME minutes
-            # from tram['timestamp']
-            tram_arrival_at_SE = tram['timestamp'] + (TRAM_TO_SE_TIME * 60)
-
-            # The earliest time the passenger can catch a bus:
-            earliest_possible_bus = tram_arrival_at_SE + (TRAM_TO_BUS_WALK_TIME * 60)
-
-            # Filter out LIVE buses that depart at or after earliest_possible_bus
-            valid_live_buses = [
-                b for b in live_buses
-                if b['timestamp'] >= earliest_possible_bus
-            ]
-            # Filter out SCHEDULED buses that depart at or after earliest_possible_bus
-            valid_scheduled_buses = [
-                b for b in scheduled_buses
-                if b['timestamp'] >= earliest_possible_bus
-            ]
-
-            # We'll pick the first valid live bus if any exist
-            next_bus = None
-            if valid_live_buses:
-                next_bus = valid_live_buses[0]  # Already sorted by timestamp
-                logging.debug(
-                    "Tram %s picking LIVE bus at %s",
-                    tram['line'], next_bus['timestamp']
-                )
-            elif valid_scheduled_buses:
-                next_bus = valid_scheduled_buses[0]
-                logging.debug(
-                    "Tram %s picking SCHEDULED bus at %s",
-                    tram['line'], next_bus['timestamp']
-                )
-            else:
-                logging.debug("Tram %s found NO valid bus!", tram['line'])
-
-            if next_bus:
-                # Layover = how many minutes from TRAM_ARRIVAL_AT_SE to bus departure
-                # minus the walk time. Another approach: next_bus['timestamp'] - earliest_possible_bus
-                # but let's keep your style—just be consistent
-                layover_minutes = int((next_bus['timestamp'] - tram_arrival_at_SE) / 60) - TRAM_TO_BUS_WALK_TIME
-
-                tram['connection'] = {
-                    "next_bus_time": next_bus['timestamp'],
-                    "wait_minutes": layover_minutes,
-                    "is_live_bus": next_bus.get('is_live', False)
-                }
-            else:
-                # No bus found for this tram
-                tram['connection'] = None
+        order = sorted(
+            range(len(northbound_trams)),
+            key=lambda i: northbound_trams[i].timestamp
+        )
+        results = [None] * len(northbound_trams)
+        live_index = 0
+        scheduled_index = 0
 
-        return northbound_trams
+        for i in order:
+            tram = northbound_trams[i]
+            # The tram reaches the bus station, then the passenger walks over
+            tram_arrival = tram.timestamp + ride_seconds
+            earliest_possible_bus = tram_arrival + walk_seconds
+
+            # Earliest boarding only grows, so the pointers never move back
+            while (live_index < len(live_buses)
+                   and live_buses[live_index].timestamp < earliest_possible_bus):
+                live_index += 1
+            while (scheduled_index < len(scheduled_buses)
+                   and scheduled_buses[scheduled_index].timestamp < earliest_possible_bus):
+                scheduled_index += 1
+
+            # Live buses first, then scheduled ones
+            candidates = live_buses[live_index:live_index + max_options]
+            if len(candidates) < max_options:
+                candidates = candidates + scheduled_buses[
+                    scheduled_index:scheduled_index + max_options - len(candidates)
+                ]
+            latest_bus = earliest_possible_bus + max_wait
+            candidates = [bus for bus in candidates if bus.timestamp <= latest_bus]
+
+            tram_spread = _spread(tram, tram_station, delays)
+            options = []
+            for bus in candidates:
+                slack = bus.timestamp - earliest_possible_bus
+                spread = math.hypot(tram_spread, _spread(bus, bus_station, delays))
+                options.append(Connection(
+                    next_bus_time=bus.timestamp,
+                    wait_minutes=int((bus.timestamp - tram_arrival) / 60) - transfer.walk_minutes,
+                    is_live_bus=bus.is_live,
+                    risk=_risk(slack, tram.delay),
+                    reliability=round(connection_probability(slack, spread), 2)
+                ))
+
+            if not options:
+                logging.debug("Tram %s found NO valid bus!", tram.line)
+
+            results[i] = tram.with_connections(options)
+
+        return results
 
     except Exception as e:
         logging.error(f"Error calculating connections: {str(e)}")
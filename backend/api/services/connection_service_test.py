@@ -0,0 +1,79 @@
+import sys
+from pathlib import Path
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).resolve().parents[3]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.api.services.config_service import Transfer
+from backend.api.services.connection_service import calculate_connections
+from backend.api.services.delay_service import DelayHistory
+from backend.api.services.departures import Connection, Departure
+
+TRANSFER = Transfer(from_direction="northbound", ride_minutes=4, walk_minutes=1)
+
+
+def _tram(timestamp, delay=0):
+    return Departure("16", "St. Emmeram", timestamp, is_live=True, delay=delay)
+
+
+def _bus(timestamp, is_live):
+    return Departure("189", "Unterföhring", timestamp, is_live=is_live)
+
+
+def _calculate(trams, buses, delays=None):
+    # No recorded history: every line gets the default delay spread
+    return calculate_connections(
+        trams, buses, transfer=TRANSFER, delays=delays or DelayHistory("/nonexistent")
+    )
+
+
+def test_prefers_live_buses_and_lists_options():
+    trams = [_tram(1000), _tram(0)]
+    buses = {"buses": [
+        _bus(2000, False), _bus(330, True), _bus(1400, True), _bus(310, True),
+    ]}
+
+    result = _calculate(trams, buses)
+
+    # Output keeps the input order; the tram at 0 can board from 300 on
+    assert [tram.timestamp for tram in result] == [1000, 0]
+    assert result[1].connection == Connection(310, 0, True, "high", reliability=0.56)
+    assert [o.next_bus_time for o in result[1].connection_options] == [310, 330, 1400]
+    assert result[1].to_json()["connection"] == {
+        "next_bus_time": 310, "wait_minutes": 0, "is_live_bus": True, "risk": "high",
+        "reliability": 0.56
+    }
+    # More slack, more reliable
+    assert [o.reliability for o in result[1].connection_options] == [0.56, 0.68, 1.0]
+
+    # The tram at 1000 boards from 1300: the live bus wins, then the scheduled one
+    late = result[0]
+    assert [o.next_bus_time for o in late.connection_options] == [1400, 2000]
+    assert late.connection.risk == "medium"
+
+    # Inputs are not modified
+    assert trams[0].connection_options is None
+
+
+def test_late_tram_raises_risk_and_missing_bus_is_none():
+    trams = [_tram(0, delay=180), _tram(5000)]
+    buses = {"buses": [_bus(900, True)]}
+
+    result = _calculate(trams, buses)
+
+    assert result[0].connection.risk == "medium"
+    assert result[1].connection is None
+    assert result[1].to_json()["connection_options"] == []
+
+
+def test_buses_beyond_the_maximum_wait_are_not_offered():
+    # A late-evening tram and the next morning's first bus
+    trams = [_tram(0)]
+    buses = {"buses": [_bus(300 + 3000, True), _bus(300 + 9 * 3600, False)]}
+
+    result = _calculate(trams, buses)
+
+    assert [o.next_bus_time for o in result[0].connection_options] == [3300]
+    assert _calculate(trams, {"buses": [_bus(300 + 9 * 3600, False)]})[0].connection is None
@@ -0,0 +1,130 @@
+import atexit
+import json
+import os
+import queue
+import tempfile
+import threading
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+# Entries kept in memory for the /api/debug view
+MAX_ENTRIES = 100
+# Entries written to disk in one go at most
+BATCH_SIZE = 200
+# Log file size that triggers a rotation, and how many old files to keep
+MAX_BYTES = 1024 * 1024
+BACKUP_COUNT = 3
+
+_STOP = object()
+
+
+class DebugLog:
+    """Debug messages kept in a ring buffer and appended to a log file.
+
+    ``add`` and ``write`` only touch memory: file writes are queued and done
+    in batches by a background thread, which also rotates the file once it
+    grows past ``max_bytes``.
+    """
+
+    def __init__(self, path, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES,
+                 backup_count=BACKUP_COUNT):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.entries = deque(maxlen=max_entries)
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def add(self, message):
+        """Add a message to the in-memory entries."""
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.entries.append(f"{timestamp} - {message}")
+
+    def write(self, message):
+        """Queue a message for the log file."""
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._start()
+        self._queue.put(f"{timestamp} - {message}\n")
+
+    def dump(self, path):
+        """Write the in-memory entries to ``path`` for another process to show."""
+        path = Path(path)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".debug-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(list(self.entries), f)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except Exception as e:
+            print(f"Error writing debug entries to {path}: {str(e)}")
+
+    def close(self, timeout=5):
+        """Flush queued messages and stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="debug-log-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            # Block for the first line, then take whatever else is waiting
+            batch = [self._queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stopping = True
+                batch = [line for line in batch if line is not _STOP]
+            if batch:
+                self._write_batch(batch)
+
+    def _write_batch(self, lines):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self.path.exists() and self.path.stat().st_size >= self.max_bytes:
+                self._rotate()
+            with open(self.path, "a") as f:
+                f.write("".join(lines))
+        except Exception as e:
+            print(f"Logging error: {str(e)}")  # Fallback to console
+
+    def _rotate(self):
+        # bus.log -> bus.log.1 -> bus.log.2 ...; the oldest is dropped
+        for index in range(self.backup_count - 1, 0, -1):
+            source = self.path.with_name(f"{self.path.name}.{index}")
+            if source.exists():
+                os.replace(source, self.path.with_name(f"{self.path.name}.{index + 1}"))
+        if self.backup_count > 0:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+
+def read_entries(path):
+    """Entries another process dumped with ``DebugLog.dump``, oldest first."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
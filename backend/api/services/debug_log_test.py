@@ -0,0 +1,36 @@
+import sys
+from pathlib import Path
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).resolve().parents[3]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.api.services.debug_log import DebugLog, read_entries
+
+
+def test_entries_are_bounded_and_file_is_rotated(tmp_path):
+    log = DebugLog(tmp_path / "debug.log", max_entries=3, max_bytes=100, backup_count=2)
+    for i in range(5):
+        log.add(f"entry {i}")
+    assert [entry.split(" - ")[1] for entry in log.entries] == ["entry 2", "entry 3", "entry 4"]
+
+    for i in range(20):
+        log.write(f"line {i}")
+        if i % 5 == 4:
+            # Flush in several batches so the file crosses the rotation size
+            log.close()
+    log.close()
+
+    files = sorted(path.name for path in tmp_path.iterdir())
+    assert files[0] == "debug.log" and len(files) <= 3
+    text = (tmp_path / "debug.log").read_text()
+    assert text.endswith("line 19\n")
+
+
+def test_entries_are_shared_through_a_dump(tmp_path):
+    assert read_entries(tmp_path / "debug.json") == []
+    log = DebugLog(tmp_path / "debug.log")
+    log.add("Error fetching live data")
+    log.dump(tmp_path / "debug.json")
+    assert read_entries(tmp_path / "debug.json") == list(log.entries)
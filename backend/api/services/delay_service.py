@@ -0,0 +1,174 @@
+"""Historical delays per line, stop and hour of the week.
+
+Live departures report both their planned and their expected time. The
+final delay of every departure is appended to a small binary file and
+folded into running statistics, which then predict the delay of departures
+only known from the timetable and how likely a transfer is to work out.
+"""
+import logging
+import math
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+from backend.api.services.snapshot_store import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+DELAY_FILE = "delays.bin"
+TIMEZONE = ZoneInfo("Europe/Berlin")
+# planned time, line, stop, delay in seconds
+RECORD = struct.Struct("<I8s24si")
+# Observations older than this (seconds) are ignored when loading
+HISTORY_WINDOW = 8 * 7 * 86400
+# Observations needed before an hour-of-week estimate is trusted
+MIN_SAMPLES = 5
+# Spread (seconds) assumed for a line without enough history
+DEFAULT_STD = 90
+# Seconds after its expected time a departure is taken to have left
+SETTLE_SECONDS = 60
+
+
+def hour_of_week(timestamp):
+    moment = datetime.fromtimestamp(timestamp, TIMEZONE)
+    return moment.weekday() * 24 + moment.hour
+
+
+class _Stats:
+    """Running mean and variance (Welford)."""
+
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def std(self):
+        if self.count < 2:
+            return None
+        return math.sqrt(self.m2 / (self.count - 1))
+
+
+class DelayHistory:
+    """Collects observed delays and estimates future ones.
+
+    ``observe`` is called for every live departure on every fetch; only the
+    last delay seen before the departure leaves is kept, so each departure
+    is stored once. ``settle`` appends the departures that have left.
+    """
+
+    def __init__(self, path=None, history_window=HISTORY_WINDOW):
+        self.path = Path(path or os.getenv("MVG_DELAY_FILE", DATA_DIR / DELAY_FILE))
+        self.history_window = history_window
+        self._pending = {}
+        self._by_hour = {}
+        self._by_line = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def observe(self, line, stop, planned, actual):
+        """Record the currently expected time of a live departure."""
+        if not planned or not actual:
+            return
+        with self._lock:
+            self._pending[(line, stop, int(planned))] = int(actual)
+
+    def settle(self, now=None):
+        """Append every pending departure that has left to the store."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._load()
+            departed = [
+                (key, actual) for key, actual in self._pending.items()
+                if actual + SETTLE_SECONDS < now
+            ]
+            for key, _ in departed:
+                del self._pending[key]
+            records = []
+            for (line, stop, planned), actual in departed:
+                self._add(line, stop, planned, actual - planned)
+                records.append(RECORD.pack(
+                    planned, line.encode("utf-8")[:8], stop.encode("utf-8")[:24], actual - planned
+                ))
+        if records:
+            self._append(records)
+
+    def predict(self, line, stop, timestamp):
+        """Expected delay (seconds) and its spread for a planned departure."""
+        with self._lock:
+            self._load()
+            stats = self._estimate(line, stop, timestamp)
+        if stats is None:
+            return 0.0, DEFAULT_STD
+        return stats.mean, stats.std or DEFAULT_STD
+
+    def spread(self, line, stop, timestamp):
+        """How far (seconds) a departure typically strays from its estimate."""
+        return self.predict(line, stop, timestamp)[1]
+
+    def _estimate(self, line, stop, timestamp):
+        stats = self._by_hour.get((line, stop, hour_of_week(timestamp)))
+        if stats is not None and stats.count >= MIN_SAMPLES:
+            return stats
+        stats = self._by_line.get((line, stop))
+        if stats is not None and stats.count >= MIN_SAMPLES:
+            return stats
+        return None
+
+    def _add(self, line, stop, planned, delay):
+        self._by_hour.setdefault((line, stop, hour_of_week(planned)), _Stats()).add(delay)
+        self._by_line.setdefault((line, stop), _Stats()).add(delay)
+
+    def _append(self, records):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(b"".join(records))
+        except Exception as e:
+            logger.error(f"Error appending delays to {self.path}: {str(e)}")
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.error(f"Error loading delays from {self.path}: {str(e)}")
+            return
+
+        cutoff = time.time() - self.history_window
+        # A torn final record (crash mid-append) is skipped
+        usable = len(data) - len(data) % RECORD.size
+        for planned, line, stop, delay in RECORD.iter_unpack(data[:usable]):
+            if planned >= cutoff:
+                self._add(
+                    line.rstrip(b"\0").decode("utf-8"),
+                    stop.rstrip(b"\0").decode("utf-8"),
+                    planned, delay
+                )
+
+
+def connection_probability(slack, spread):
+    """Chance the connection works: P(slack + N(0, spread^2) >= 0)."""
+    if spread <= 0:
+        return 1.0 if slack >= 0 else 0.0
+    return 0.5 * (1 + math.erf(slack / (spread * math.sqrt(2))))
+
+
+delay_history = DelayHistory()
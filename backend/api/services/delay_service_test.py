@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).resolve().parents[3]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.api.services.delay_service import DEFAULT_STD, DelayHistory
+
+# Monday 2025-10-13 08:00 in Munich
+MONDAY_8AM = 1760335200
+
+
+def test_settled_delays_predict_and_survive_reload(tmp_path):
+    path = tmp_path / "delays.bin"
+    history = DelayHistory(path, history_window=10 ** 10)
+    assert history.predict("189", "st_emmeram", MONDAY_8AM) == (0.0, DEFAULT_STD)
+
+    for week, delay in enumerate([60, 120, 90, 60, 120]):
+        planned = MONDAY_8AM - (week + 1) * 7 * 86400
+        # Seen twice while approaching; only the last delay counts
+        history.observe("189", "st_emmeram", planned, planned + 30)
+        history.observe("189", "st_emmeram", planned, planned + delay)
+    history.settle(now=MONDAY_8AM)
+
+    mean, spread = history.predict("189", "st_emmeram", MONDAY_8AM)
+    assert mean == 90 and round(spread) == 30
+
+    reloaded = DelayHistory(path, history_window=10 ** 10)
+    assert reloaded.predict("189", "st_emmeram", MONDAY_8AM) == (mean, spread)
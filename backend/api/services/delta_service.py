@@ -0,0 +1,132 @@
+"""Changes between two published versions of a board.
+
+Clients that already hold version ``since`` fetch only the departures that
+were added, removed or changed since, instead of the whole board. When
+that version is no longer in the history, or belongs to another ``epoch``
+(versions restart with every start of the refresher), the full board is
+sent instead.
+
+The refresher process precomputes the delta from every version in its
+history with ``encode_deltas`` and publishes them with each snapshot, so
+every server worker can answer any cursor without a history of its own.
+
+Departures are identified by line, destination and planned time, so a
+delay update shows up as a change rather than a removal plus an addition.
+``minutes`` is left out of the comparison: it changes on every publish and
+clients derive it from ``timestamp``.
+"""
+from backend.api.services.refresh_service import VersionedBodyCache, encode_body
+
+
+def _as_dict(departure):
+    # Reader workers hold the board as decoded JSON, the refresher as models
+    return departure.to_json() if hasattr(departure, "to_json") else departure
+
+
+def departure_id(data):
+    """Stable id of a departure (as JSON) across versions."""
+    delay = data.get("delay") or data.get("predicted_delay") or 0
+    return f"{data['line']}|{data['destination']}|{data['timestamp'] - delay}"
+
+
+def _with_id(data):
+    return {**data, "id": departure_id(data)}
+
+
+def _comparable(data):
+    return {key: value for key, value in data.items() if key != "minutes"}
+
+
+def diff_departures(old, new):
+    """Added, changed and removed departures between two lists."""
+    old = {departure_id(data): data for data in map(_as_dict, old)}
+    added = []
+    changed = []
+    seen = set()
+    for data in map(_as_dict, new):
+        key = departure_id(data)
+        seen.add(key)
+        previous = old.get(key)
+        if previous is None:
+            added.append(_with_id(data))
+        elif _comparable(previous) != _comparable(data):
+            changed.append(_with_id(data))
+    removed = [key for key in old if key not in seen]
+    return {"added": added, "changed": changed, "removed": removed}
+
+
+def _sections(board_data):
+    """Every departure list of a board, keyed by section and group."""
+    return {
+        "trams": board_data["trams"],
+        "buses": board_data["buses"],
+    }
+
+
+def full_board(board_data, epoch, version):
+    """The whole board, with ids, for clients without a usable cursor."""
+    payload = {"epoch": epoch, "version": version, "since": None, "full": True}
+    for section, groups in _sections(board_data).items():
+        payload[section] = {
+            group: [_with_id(_as_dict(dep)) for dep in departures]
+            for group, departures in groups.items()
+        }
+    payload["weather"] = board_data.get("weather")
+    payload["stale"] = board_data.get("stale", [])
+    payload["lastUpdated"] = board_data["lastUpdated"]
+    return payload
+
+
+def board_delta(old_data, new_data, since, epoch, version):
+    """The changes turning board ``old_data`` (``since``) into ``new_data``."""
+    payload = {"epoch": epoch, "version": version, "since": since, "full": False}
+    old_sections = _sections(old_data)
+    for section, groups in _sections(new_data).items():
+        payload[section] = {
+            group: diff_departures(old_sections[section].get(group, []), departures)
+            for group, departures in groups.items()
+        }
+    if old_data.get("weather") != new_data.get("weather"):
+        payload["weather"] = new_data.get("weather")
+    payload["stale"] = new_data.get("stale", [])
+    payload["lastUpdated"] = new_data["lastUpdated"]
+    return payload
+
+
+def build_delta(history, snapshot, board_name, since, epoch):
+    """Delta from ``since`` to ``snapshot``, or the full board if it is gone."""
+    new_data = snapshot.data[board_name]
+    old = history.get(since) if since is not None and epoch == snapshot.epoch else None
+    if old is None or board_name not in old.data:
+        return full_board(new_data, snapshot.epoch, snapshot.version)
+    return board_delta(old.data[board_name], new_data, since, snapshot.epoch, snapshot.version)
+
+
+def encode_deltas(history, snapshot, encoder=encode_body):
+    """Encoded deltas from every version in ``history`` to ``snapshot``.
+
+    Keyed by board and cursor version; the None cursor holds the full board.
+    """
+    bodies = {}
+    for board_name, new_data in snapshot.data.items():
+        bodies[(board_name, None)] = encoder(
+            full_board(new_data, snapshot.epoch, snapshot.version)
+        )
+        for old in history.snapshots():
+            if board_name not in old.data:
+                continue
+            bodies[(board_name, old.version)] = encoder(board_delta(
+                old.data[board_name], new_data, old.version, snapshot.epoch, snapshot.version
+            ))
+    return bodies
+
+
+def published_delta(snapshot, board_name, since, epoch):
+    """The refresher's precomputed delta, or the full board for other cursors."""
+    body = None
+    if since is not None and epoch == snapshot.epoch:
+        body = snapshot.deltas.get((board_name, since))
+    return body or snapshot.deltas[(board_name, None)]
+
+
+delta_cache = VersionedBodyCache()
@@ -0,0 +1,97 @@
+import json
+import sys
+from pathlib import Path
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).resolve().parents[3]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.api.services.delta_service import build_delta, published_delta
+from backend.api.services.departures import Departure
+from backend.api.services.refresh_service import Snapshot, SnapshotHistory, encode_body
+from backend.api.services.shared_snapshot import SharedSnapshotWriter, read_snapshot
+
+EPOCH = 1700000000
+
+
+def board(trams, weather):
+    return {
+        "trams": {"northbound": trams},
+        "buses": {"buses": []},
+        "weather": weather,
+        "stale": [],
+        "lastUpdated": 900,
+    }
+
+
+def snapshot(version, data, epoch=EPOCH):
+    return Snapshot(
+        data={"default": data}, created_at=0, version=version, changes={},
+        bodies={"default": encode_body(data)}, epoch=epoch
+    )
+
+
+def test_delta_reports_added_changed_and_removed_departures():
+    gone = Departure("16", "St. Emmeram", 1000, is_live=True, minutes=1)
+    late = Departure("16", "St. Emmeram", 1300, is_live=True, minutes=5)
+    history = SnapshotHistory(maxlen=2)
+    history.add(snapshot(1, board([gone, late], {"temp": 12})))
+    new = snapshot(2, board([
+        # Same planned time (1300), now two minutes late
+        Departure("16", "St. Emmeram", 1420, is_live=True, delay=120, minutes=4),
+        Departure("16", "St. Emmeram", 1900, is_live=True, minutes=9),
+    ], {"temp": 12}))
+    history.add(new)
+
+    delta = build_delta(history, new, "default", since=1, epoch=EPOCH)
+    trams = delta["trams"]["northbound"]
+    assert delta["full"] is False and (delta["epoch"], delta["version"]) == (EPOCH, 2)
+    assert [dep["id"] for dep in trams["changed"]] == ["16|St. Emmeram|1300"]
+    assert [dep["id"] for dep in trams["added"]] == ["16|St. Emmeram|1900"]
+    assert trams["removed"] == ["16|St. Emmeram|1000"]
+    assert "weather" not in delta
+
+    # Only the minutes moved: nothing to send
+    assert build_delta(history, new, "default", since=2, epoch=EPOCH)["trams"]["northbound"] == {
+        "added": [], "changed": [], "removed": []
+    }
+
+
+def test_unknown_cursor_falls_back_to_the_full_board():
+    history = SnapshotHistory(maxlen=1)
+    history.add(snapshot(5, board([], None)))
+    latest = snapshot(6, board([Departure("16", "Romanplatz", 1000, is_live=False)], None))
+    history.add(latest)
+
+    delta = build_delta(history, latest, "default", since=5, epoch=EPOCH)
+    assert delta["full"] is True
+    assert delta["trams"]["northbound"][0]["id"] == "16|Romanplatz|1000"
+
+    # Version 6 of an earlier run is another snapshot altogether
+    assert build_delta(history, latest, "default", since=6, epoch=EPOCH - 60)["full"] is True
+    assert build_delta(history, latest, "default", since=6, epoch=EPOCH)["full"] is False
+
+
+def test_workers_serve_the_deltas_the_refresher_published(tmp_path):
+    history = SnapshotHistory()
+    first = snapshot(1, board([Departure("16", "Romanplatz", 1000, is_live=False)], None))
+    latest = snapshot(2, board([Departure("16", "Romanplatz", 1600, is_live=False)], None))
+    history.add(first)
+    history.add(latest)
+    SharedSnapshotWriter(tmp_path / "published.bin", history=history).write(latest)
+
+    published = read_snapshot(tmp_path / "published.bin")
+    assert (published.epoch, published.version) == (EPOCH, 2)
+
+    def served(since, epoch):
+        return json.loads(published_delta(published, "default", since, epoch).raw)
+
+    delta = served(1, EPOCH)
+    assert delta["full"] is False
+    assert delta["trams"]["northbound"]["removed"] == ["16|Romanplatz|1000"]
+    assert served(2, EPOCH)["trams"]["northbound"]["added"] == []
+    # Cursors from another run or already aged out get the full board
+    assert served(1, EPOCH - 60)["full"] is True
+    assert served(0, EPOCH)["full"] is True
+    assert served(None, None)["trams"]["northbound"][0]["id"] == "16|Romanplatz|1600"
@@ -0,0 +1,236 @@
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+
+# Interned line and destination strings, shared by every table
+_strings = []
+_codes = {}
+_strings_lock = threading.Lock()
+
+
+def intern_code(value):
+    """Return the integer code for a line or destination string."""
+    code = _codes.get(value)
+    if code is None:
+        with _strings_lock:
+            code = _codes.get(value)
+            if code is None:
+                code = len(_strings)
+                _strings.append(sys.intern(value))
+                _codes[value] = code
+    return code
+
+
+def string_for(code):
+    return _strings[code]
+
+
+def intern_string(value):
+    """The shared instance of a line or destination string."""
+    return _strings[intern_code(value)]
+
+
+class Connection:
+    """A bus a tram passenger can transfer to.
+
+    ``reliability`` is the estimated probability (0-1) of making the bus.
+    """
+
+    __slots__ = ("next_bus_time", "wait_minutes", "is_live_bus", "risk", "reliability")
+
+    def __init__(self, next_bus_time, wait_minutes, is_live_bus, risk, reliability=None):
+        self.next_bus_time = next_bus_time
+        self.wait_minutes = wait_minutes
+        self.is_live_bus = is_live_bus
+        self.risk = risk
+        self.reliability = reliability
+
+    def _key(self):
+        return (
+            self.next_bus_time, self.wait_minutes, self.is_live_bus, self.risk,
+            self.reliability
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, Connection) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"Connection{self._key()!r}"
+
+    def to_json(self):
+        data = {
+            "next_bus_time": self.next_bus_time,
+            "wait_minutes": self.wait_minutes,
+            "is_live_bus": self.is_live_bus,
+            "risk": self.risk
+        }
+        if self.reliability is not None:
+            data["reliability"] = self.reliability
+        return data
+
+
+class Departure:
+    """A single tram or bus departure, shared by every service.
+
+    Instances are treated as immutable: services derive new departures
+    (``with_minutes``, ``with_connections``) instead of changing them.
+    """
+
+    __slots__ = (
+        "line", "destination", "timestamp", "delay", "is_live",
+        "minutes", "connection_options"
+    )
+
+    def __init__(self, line, destination, timestamp, is_live, delay=0,
+                 minutes=None, connection_options=None):
+        self.line = intern_string(line)
+        self.destination = intern_string(destination)
+        self.timestamp = timestamp
+        self.delay = delay
+        self.is_live = is_live
+        self.minutes = minutes
+        self.connection_options = connection_options
+
+    @property
+    def connection(self):
+        """The recommended transfer, if any."""
+        if self.connection_options:
+            return self.connection_options[0]
+        return None
+
+    def with_minutes(self, minutes):
+        return Departure(
+            self.line, self.destination, self.timestamp, self.is_live,
+            self.delay, minutes, self.connection_options
+        )
+
+    def with_connections(self, connection_options):
+        return Departure(
+            self.line, self.destination, self.timestamp, self.is_live,
+            self.delay, self.minutes, tuple(connection_options)
+        )
+
+    def _key(self):
+        return (
+            self.line, self.destination, self.timestamp, self.delay,
+            self.is_live, self.minutes, self.connection_options
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, Departure) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"Departure{self._key()!r}"
+
+    def to_json(self):
+        data = {
+            "line": self.line,
+            "destination": self.destination,
+            "timestamp": self.timestamp,
+            "is_live": self.is_live
+        }
+        if self.minutes is not None:
+            data["minutes"] = self.minutes
+        # Scheduled departures only carry the delay predicted from history
+        if self.is_live:
+            data["delay"] = self.delay
+        elif self.delay:
+            data["predicted_delay"] = self.delay
+        if self.connection_options is not None:
+            connection = self.connection
+            data["connection"] = connection.to_json() if connection else None
+            data["connection_options"] = [o.to_json() for o in self.connection_options]
+        return data
+
+
+def json_default(obj):
+    """``default`` hook letting json.dumps serialize the models directly."""
+    if isinstance(obj, (Departure, Connection)):
+        return obj.to_json()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class DepartureTable:
+    """Departures stored column-wise and sorted by timestamp.
+
+    A table is built once per upstream fetch and never modified, so it can
+    be cached and shared between threads as is. Relative minutes are only
+    derived in ``render``, in one pass over the timestamp column.
+    """
+
+    __slots__ = ("timestamps", "delays", "lines", "destinations", "live")
+
+    def __init__(self, timestamps, delays, lines, destinations, live):
+        self.timestamps = timestamps
+        self.delays = delays
+        self.lines = lines
+        self.destinations = destinations
+        self.live = live
+
+    @classmethod
+    def from_departures(cls, departures):
+        """Build a table from Departure objects."""
+        departures = sorted(departures, key=lambda dep: dep.timestamp)
+        return cls(
+            timestamps=array("q", (dep.timestamp for dep in departures)),
+            delays=array("i", (dep.delay or 0 for dep in departures)),
+            lines=array("I", (intern_code(dep.line) for dep in departures)),
+            destinations=array("I", (intern_code(dep.destination) for dep in departures)),
+            live=bytes(bool(dep.is_live) for dep in departures)
+        )
+
+    @classmethod
+    def empty(cls):
+        return cls.from_departures(())
+
+    def to_columns(self):
+        """Plain lists for persisting; codes are stored as their strings."""
+        return {
+            "timestamps": self.timestamps.tolist(),
+            "delays": self.delays.tolist(),
+            "lines": [_strings[code] for code in self.lines],
+            "destinations": [_strings[code] for code in self.destinations],
+            "live": list(self.live)
+        }
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Rebuild a table from ``to_columns`` output."""
+        return cls(
+            timestamps=array("q", columns["timestamps"]),
+            delays=array("i", columns["delays"]),
+            lines=array("I", (intern_code(line) for line in columns["lines"])),
+            destinations=array("I", (intern_code(dest) for dest in columns["destinations"])),
+            live=bytes(columns["live"])
+        )
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def render(self, current_timestamp, limit=None):
+        """Upcoming departures with ``minutes`` relative to now."""
+        start = bisect_left(self.timestamps, current_timestamp)
+        end = len(self.timestamps) if limit is None else min(start + limit, len(self.timestamps))
+        minutes = [
+            int((timestamp - current_timestamp) // 60)
+            for timestamp in self.timestamps[start:end]
+        ]
+
+        return [
+            Departure(
+                line=_strings[self.lines[i]],
+                destination=_strings[self.destinations[i]],
+                timestamp=self.timestamps[i],
+                is_live=bool(self.live[i]),
+                delay=self.delays[i],
+                minutes=minutes[offset]
+            )
+            for offset, i in enumerate(range(start, end))
+        ]
@@ -0,0 +1,122 @@
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import threading
+import time
+
+from mvg import MvgApi
+
+from backend.api.services.http_clients import MVG_TIMEOUT, close_mvg_session, mvg_session
+from backend.api.services.metrics import upstream_seconds
+from backend.api.services.quota import get_quota
+from backend.api.services.resilience import get_breaker
+
+logger = logging.getLogger(__name__)
+
+# Seconds a single station query may take before it is cancelled
+DEFAULT_TIMEOUT = MVG_TIMEOUT
+
+_loop = None
+_loop_lock = threading.Lock()
+# Latest departures fetched per station, read by the journey planner so it
+# never queries MVG itself; entries are replaced, never modified
+_latest = {}
+
+
+def _get_loop():
+    """Return the shared event loop, starting its thread on first use."""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="mvg-fetch", daemon=True
+                ).start()
+                _loop = loop
+                atexit.register(_close_clients)
+    return _loop
+
+
+def _close_clients():
+    try:
+        asyncio.run_coroutine_threadsafe(close_mvg_session(), _loop).result(2)
+    except Exception as e:
+        logger.debug(f"Error closing the MVG session: {str(e)}")
+
+
+def breaker_name(station_id):
+    """Name of the circuit breaker guarding a station's departures."""
+    return f"mvg:{station_id}"
+
+
+async def _fetch_station(station_id, timeout):
+    breaker = get_breaker(breaker_name(station_id))
+    # Fails fast with CircuitOpenError while the station keeps failing, then
+    # with QuotaExceededError once the shared MVG budget is used up
+    breaker.before_call(get_quota("mvg"))
+    start = time.perf_counter()
+    try:
+        # Pooled keep-alive connections instead of a new session per call
+        session = await mvg_session()
+        departures = await asyncio.wait_for(
+            MvgApi.departures_async(station_id, session=session), timeout
+        )
+    except BaseException:
+        upstream_seconds.observe(time.perf_counter() - start, upstream="mvg", outcome="error")
+        breaker.record_failure()
+        raise
+    upstream_seconds.observe(time.perf_counter() - start, upstream="mvg", outcome="ok")
+    breaker.record_success()
+    _latest[station_id] = departures
+    return departures
+
+
+async def _fetch_all(station_ids, timeout):
+    results = await asyncio.gather(
+        *(_fetch_station(station_id, timeout) for station_id in station_ids),
+        return_exceptions=True
+    )
+    return dict(zip(station_ids, results))
+
+
+def fetch_departures(station_ids, timeout=DEFAULT_TIMEOUT, budget=None):
+    """Query departures for all stations concurrently.
+
+    Returns a dict mapping each station id to its list of departures, or to
+    the exception raised for that station. A station that does not answer
+    within ``timeout`` seconds (capped by the LatencyBudget ``budget``) is
+    cancelled and mapped to a TimeoutError, so the whole call takes as long
+    as the slowest station, never the sum. Stations whose circuit breaker
+    is open map to CircuitOpenError without any network call.
+    """
+    station_ids = list(dict.fromkeys(station_ids))
+    if not station_ids:
+        return {}
+    if budget is not None:
+        timeout = budget.timeout(timeout)
+
+    future = asyncio.run_coroutine_threadsafe(
+        _fetch_all(station_ids, timeout), _get_loop()
+    )
+    try:
+        # Small grace period on top of the per-call timeout for scheduling
+        return future.result(timeout + 1)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        logger.error(f"Timed out fetching departures for {station_ids}")
+        return {station_id: TimeoutError() for station_id in station_ids}
+
+
+def latest_departures(station_id):
+    """The departures last fetched for a station, or None; never queries MVG."""
+    return _latest.get(station_id)
+
+
+def fetch_station_departures(station_id, timeout=DEFAULT_TIMEOUT, budget=None):
+    """Query departures for a single station, raising on failure."""
+    result = fetch_departures([station_id], timeout=timeout, budget=budget)[station_id]
+    if isinstance(result, BaseException):
+        raise result
+    return result
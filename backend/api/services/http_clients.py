@@ -0,0 +1,64 @@
+"""Shared, pooled HTTP clients for the upstream APIs.
+
+Every service reaches MVG and OpenWeather through these clients, so
+connections (and their TLS sessions) are kept alive and reused across
+refreshes instead of being set up for every request.
+"""
+import os
+import threading
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+# Connections kept open per upstream host
+MVG_POOL_SIZE = int(os.getenv("MVG_POOL_SIZE", "10"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "4"))
+# Seconds an idle connection is kept open for reuse
+KEEPALIVE_SECONDS = int(os.getenv("HTTP_KEEPALIVE", "60"))
+# Per-request timeouts (seconds)
+MVG_TIMEOUT = float(os.getenv("MVG_TIMEOUT", "8"))
+OPENWEATHER_TIMEOUT = float(os.getenv("OPENWEATHER_TIMEOUT", "5"))
+
+_mvg_session = None
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+async def mvg_session():
+    """The aiohttp session for MVG; must be awaited on the fetch loop."""
+    global _mvg_session
+    if _mvg_session is None or _mvg_session.closed:
+        _mvg_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=MVG_POOL_SIZE,
+                keepalive_timeout=KEEPALIVE_SECONDS,
+                ttl_dns_cache=300
+            )
+        )
+    return _mvg_session
+
+
+async def close_mvg_session():
+    global _mvg_session
+    if _mvg_session is not None and not _mvg_session.closed:
+        await _mvg_session.close()
+    _mvg_session = None
+
+
+def http_session(name):
+    """The requests.Session shared by every caller of an upstream ``name``."""
+    session = _sessions.get(name)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(name)
+            if session is None:
+                session = requests.Session()
+                # Retries are the circuit breaker's job, not the adapter's
+                adapter = HTTPAdapter(
+                    pool_connections=1, pool_maxsize=HTTP_POOL_SIZE, max_retries=0
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _sessions[name] = session
+    return session
@@ -0,0 +1,277 @@
+"""Multi-leg journey planning over the configured network.
+
+Every ride leg of the network (see ``network`` in boards.yaml) turns the
+live and scheduled departures at its station into elementary connections
+(departure, arrival, from, to). Live departures are the ones the refresh
+scheduler last fetched for the boards, so building the index never queries
+MVG and follows the scheduler's adaptive intervals; stations no board
+shows contribute their timetable only. The sorted connection list is
+rebuilt at most every ``CONNECTIONS_TTL`` seconds and scanned once per query
+with the Connection Scan Algorithm, which yields earliest arrivals in a
+single pass.
+
+Under gunicorn the refresher process builds the index and publishes it
+(``publish_connections``); workers plan from the published file
+(``SharedConnections``) and make no upstream calls.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple
+from pathlib import Path
+
+from backend.api.services.cache import TTLCache
+from backend.api.services.config_service import config
+from backend.api.services.fetch_service import latest_departures
+from backend.api.services.snapshot_store import DATA_DIR
+from backend.api.services.timetable_service import timetable
+
+logger = logging.getLogger(__name__)
+
+# Seconds a built connection list is reused before being rebuilt
+CONNECTIONS_TTL = 30
+# How far ahead (seconds) scheduled connections are generated
+HORIZON = 6 * 3600
+# Scheduled departures considered per ride leg
+SCHEDULE_LIMIT = 100
+# Scheduled departures within this many seconds after the last live one are
+# assumed to be covered by the live data
+LIVE_OVERLAP = 600
+MAX_JOURNEYS = 5
+
+CONNECTIONS_FILE = "connections.json"
+# How often (seconds) workers look for a newer published index
+CHECK_INTERVAL = 1
+
+RideConnection = namedtuple(
+    "RideConnection",
+    ["departure", "arrival", "from_station", "to_station", "line", "destination", "is_live"]
+)
+ConnectionIndex = namedtuple("ConnectionIndex", ["connections", "departures"])
+
+_connections_cache = TTLCache(
+    ttl=CONNECTIONS_TTL, max_stale=CONNECTIONS_TTL * 4, name="journey_connections"
+)
+
+
+def _leg_connections(leg, live_departures, now):
+    """Connections for one ride leg: live first, then the timetable beyond them."""
+    connections = []
+    for dep in live_departures:
+        if dep.get("cancelled") or leg.filter.classify(dep) is None:
+            continue
+        planned_time = dep.get("planned", 0)
+        actual_time = dep.get("time", planned_time)
+        if actual_time >= now:
+            connections.append(RideConnection(
+                actual_time, actual_time + leg.seconds, leg.station, leg.to,
+                dep.get("line"), dep.get("destination"), True
+            ))
+
+    last_live = max((c.departure for c in connections), default=None)
+    patterns = [
+        pattern for pattern in timetable.patterns(leg.station)
+        if leg.filter.classify_key(pattern.type, pattern.line, pattern.destination)
+    ]
+    for timestamp, pattern in timetable.next_departures(
+        patterns, now, limit=SCHEDULE_LIMIT, horizon=HORIZON
+    ):
+        if last_live is not None and timestamp <= last_live + LIVE_OVERLAP:
+            continue
+        connections.append(RideConnection(
+            timestamp, timestamp + leg.seconds, leg.station, leg.to,
+            pattern.line, pattern.destination, False
+        ))
+
+    return connections
+
+
+def build_connections(now=None):
+    """Build the time-sorted connection index for the whole network."""
+    now = int(now or time.time())
+    connections = []
+    for station, legs in config.network.rides.items():
+        live_departures = []
+        for station_id in config.stations[station].ids:
+            live_departures.extend(latest_departures(station_id) or ())
+        for leg in legs:
+            connections.extend(_leg_connections(leg, live_departures, now))
+
+    connections.sort(key=lambda c: c.departure)
+    return ConnectionIndex(connections, [c.departure for c in connections])
+
+
+def get_connections():
+    """The cached connection index."""
+    return _connections_cache.get("connections", build_connections)
+
+
+def _default_connections_path():
+    return Path(os.getenv("MVG_CONNECTIONS_PATH", DATA_DIR / CONNECTIONS_FILE))
+
+
+def publish_connections(path=None):
+    """Write the current connection index for the workers to plan from."""
+    path = Path(path or _default_connections_path())
+    try:
+        index = get_connections()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".connections-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(index.connections, f, separators=(",", ":"))
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except Exception as e:
+        logger.error(f"Error publishing connections to {path}: {str(e)}")
+
+
+def read_connections(path):
+    """Load a connection index written by publish_connections."""
+    with open(path) as f:
+        connections = [RideConnection(*row) for row in json.load(f)]
+    return ConnectionIndex(connections, [c.departure for c in connections])
+
+
+class SharedConnections:
+    """The connection index the refresher process publishes, for workers."""
+
+    def __init__(self, path=None, check_interval=CHECK_INTERVAL):
+        self.path = Path(path or _default_connections_path())
+        self.check_interval = check_interval
+        self._index = None
+        self._file_id = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The latest published index, or None before the first one."""
+        with self._lock:
+            if time.monotonic() - self._checked_at >= self.check_interval:
+                self._reload()
+                self._checked_at = time.monotonic()
+            return self._index
+
+    def _reload(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if file_id == self._file_id:
+            return
+        try:
+            self._index = read_connections(self.path)
+            self._file_id = file_id
+        except Exception as e:
+            logger.error(f"Error reading published connections {self.path}: {str(e)}")
+
+
+def earliest_arrival(origin, destination, after, index=None, network=None):
+    """Earliest-arrival journey from ``origin`` leaving at or after ``after``.
+
+    Returns the journey as a list of legs, or None when the destination
+    cannot be reached within the connection horizon. ``index`` and
+    ``network`` default to the cached connections and configured network.
+    """
+    network = network or config.network
+    index = index or get_connections()
+    infinity = float("inf")
+
+    arrival = {origin: after}
+    # Earliest moment a vehicle can be boarded at a station
+    ready = {origin: after}
+    parent = {}
+
+    def walk_from(station, at):
+        for to_station, seconds in network.walks.get(station, ()):
+            if at + seconds < arrival.get(to_station, infinity):
+                arrival[to_station] = ready[to_station] = at + seconds
+                parent[to_station] = ("walk", station, at, at + seconds)
+
+    walk_from(origin, after)
+
+    for i in range(bisect_left(index.departures, after), len(index.connections)):
+        c = index.connections[i]
+        if c.departure >= arrival.get(destination, infinity):
+            break
+        if ready.get(c.from_station, infinity) <= c.departure and (
+            c.arrival < arrival.get(c.to_station, infinity)
+        ):
+            arrival[c.to_station] = c.arrival
+            ready[c.to_station] = c.arrival + network.change_seconds(c.to_station)
+            parent[c.to_station] = ("ride", c)
+            walk_from(c.to_station, c.arrival)
+
+    if destination not in parent:
+        return None
+
+    legs = []
+    station = destination
+    while station != origin and len(legs) <= len(parent):
+        step = parent[station]
+        if step[0] == "ride":
+            c = step[1]
+            legs.append({
+                "type": "ride",
+                "from": c.from_station,
+                "to": c.to_station,
+                "line": c.line,
+                "destination": c.destination,
+                "departure": c.departure,
+                "arrival": c.arrival,
+                "is_live": c.is_live
+            })
+            station = c.from_station
+        else:
+            _, from_station, start, end = step
+            legs.append({
+                "type": "walk",
+                "from": from_station,
+                "to": station,
+                "departure": start,
+                "arrival": end
+            })
+            station = from_station
+    legs.reverse()
+    return legs
+
+
+def plan_journeys(origin, destination, after=None, count=3, index=None, network=None):
+    """Up to ``count`` successive earliest-arrival journeys."""
+    network = network or config.network
+    for station in (origin, destination):
+        if station not in network.stations:
+            raise ValueError(f"Unknown station: {station}")
+    if origin == destination:
+        raise ValueError("Origin and destination must differ")
+
+    after = int(after or time.time())
+    index = index or get_connections()
+    journeys = []
+
+    while len(journeys) < min(count, MAX_JOURNEYS):
+        legs = earliest_arrival(origin, destination, after, index, network)
+        if not legs:
+            break
+        rides = [leg for leg in legs if leg["type"] == "ride"]
+        journeys.append({
+            "departure": legs[0]["departure"],
+            "arrival": legs[-1]["arrival"],
+            "duration_minutes": int((legs[-1]["arrival"] - legs[0]["departure"]) // 60),
+            "transfers": max(len(rides) - 1, 0),
+            "legs": legs
+        })
+        if not rides:
+            break
+        # The next journey must leave after this one's first ride
+        after = rides[0]["departure"] + 1
+
+    return journeys
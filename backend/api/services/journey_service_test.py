@@ -0,0 +1,113 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).resolve().parents[3]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.api.services.config_service import Network, Station
+from backend.api.services import fetch_service, journey_service
+from backend.api.services.journey_service import (
+    ConnectionIndex, RideConnection, SharedConnections, build_connections, earliest_arrival,
+    plan_journeys, publish_connections
+)
+
+# a --tram--> b, walk b <-> c (120s), c --bus--> d; e is unconnected
+NETWORK = Network(
+    stations={
+        key: Station(key, key.upper(), (), change)
+        for key, change in (("a", 60), ("b", 60), ("c", 120), ("d", 60), ("e", 60))
+    },
+    rides={},
+    walks={"b": [("c", 120)], "c": [("b", 120)]},
+)
+
+
+def _ride(departure, arrival, from_station, to_station, line, is_live=True):
+    return RideConnection(departure, arrival, from_station, to_station, line, to_station, is_live)
+
+
+def _index(*connections):
+    connections = sorted(connections, key=lambda c: c.departure)
+    return ConnectionIndex(connections, [c.departure for c in connections])
+
+
+INDEX = _index(
+    _ride(1000, 1300, "a", "b", "16"),
+    _ride(1600, 1900, "a", "b", "16"),
+    # Leaves before the 1300 arrival at b plus the 120s walk to c
+    _ride(1400, 2000, "c", "d", "189"),
+    _ride(1540, 2140, "c", "d", "189", is_live=False),
+    _ride(2200, 2800, "c", "d", "189"),
+)
+
+
+def test_multi_leg_journey_with_walk_and_change_time():
+    legs = earliest_arrival("a", "d", 900, INDEX, NETWORK)
+
+    assert [leg["type"] for leg in legs] == ["ride", "walk", "ride"]
+    assert (legs[0]["departure"], legs[0]["arrival"]) == (1000, 1300)
+    assert (legs[1]["from"], legs[1]["to"], legs[1]["arrival"]) == ("b", "c", 1420)
+    # Walking in leaves no change time to wait for
+    assert legs[2]["departure"] == 1540 and legs[2]["is_live"] is False
+
+
+def test_change_time_applies_after_a_ride():
+    index = _index(_ride(1000, 1300, "a", "b", "16"), _ride(1330, 1500, "b", "e", "X"),
+                   _ride(1400, 1600, "b", "e", "X"))
+    legs = earliest_arrival("a", "e", 900, index, NETWORK)
+    # 1300 arrival + 60s change at b: the 1330 is missed
+    assert legs[-1]["departure"] == 1400
+
+
+def test_unreachable_destination():
+    assert earliest_arrival("a", "e", 900, INDEX, NETWORK) is None
+    assert earliest_arrival("a", "d", 2300, INDEX, NETWORK) is None
+
+
+def test_successive_journeys_leave_later():
+    journeys = plan_journeys("a", "d", after=900, count=3, index=INDEX, network=NETWORK)
+
+    assert [(j["departure"], j["arrival"]) for j in journeys] == [(1000, 2140), (1600, 2800)]
+    assert [j["transfers"] for j in journeys] == [1, 1]
+    assert journeys[0]["duration_minutes"] == 19
+
+
+def test_unknown_or_identical_stations_are_rejected():
+    with pytest.raises(ValueError):
+        plan_journeys("a", "x", index=INDEX, network=NETWORK)
+    with pytest.raises(ValueError):
+        plan_journeys("a", "a", index=INDEX, network=NETWORK)
+
+
+def test_workers_plan_from_the_published_index(tmp_path, monkeypatch):
+    path = tmp_path / "connections.json"
+    shared = SharedConnections(path, check_interval=0)
+    assert shared.get() is None
+
+    monkeypatch.setattr(journey_service, "get_connections", lambda: INDEX)
+    publish_connections(path)
+
+    assert shared.get() == INDEX
+    journeys = plan_journeys("a", "d", after=900, index=shared.get(), network=NETWORK)
+    assert journeys[0]["arrival"] == 2140
+
+
+def test_index_uses_the_departures_the_scheduler_fetched(monkeypatch):
+    def no_upstream(*args, **kwargs):
+        raise AssertionError("the journey index must not query MVG")
+
+    now = 1_800_000_000
+    monkeypatch.setattr(fetch_service, "fetch_departures", no_upstream)
+    monkeypatch.setattr(fetch_service, "_latest", {"de:09162:632": [
+        {"type": "Tram", "line": "16", "destination": "St. Emmeram",
+         "planned": now + 300, "time": now + 360},
+    ]})
+
+    live = [c for c in build_connections(now).connections if c.is_live]
+    assert live == [RideConnection(
+        now + 360, now + 600, "prinz_eugen_park", "st_emmeram", "16", "St. Emmeram", True
+    )]
@@ -0,0 +1,291 @@
+"""In-process metrics rendered in the Prometheus text format.
+
+Services record into the module-level metrics below; ``/metrics`` renders
+them. Under gunicorn the refresher process dumps its samples to the data
+directory and the workers merge them into their own output.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from backend.api.services.snapshot_store import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# Where the refresher process dumps its samples for the workers
+REFRESHER_METRICS_PATH = DATA_DIR / "refresher-metrics.json"
+# Touched by the refresher's scheduler loop on every tick
+REFRESHER_HEARTBEAT_PATH = DATA_DIR / "refresher-heartbeat"
+# Where every gunicorn worker dumps its samples, as <pid>.json
+WORKER_METRICS_DIR = DATA_DIR / "worker-metrics"
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in sorted(labels.items())
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key):
+        return dict(zip(self.labelnames, key))
+
+    def family(self):
+        """This metric as a plain dict: name, type, help and samples."""
+        return {
+            "name": self.name,
+            "type": self.type,
+            "help": self.documentation,
+            "samples": self.samples()
+        }
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [[self.name + "_total", self._labels(key), value] for key, value in items]
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, or is computed when scraped."""
+
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        if self.function is not None:
+            value = self.function()
+            return [] if value is None else [[self.name, {}, value]]
+        with self._lock:
+            items = list(self._values.items())
+        return [[self.name, self._labels(key), value] for key, value in items]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * len(self.buckets), 0.0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the ``with`` block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        samples = []
+        for key, counts, total in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append([
+                    self.name + "_bucket", {**labels, "le": _format_value(bound)}, cumulative
+                ])
+            samples.append([self.name + "_sum", labels, total])
+            samples.append([self.name + "_count", labels, cumulative])
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collect(self):
+        return [metric.family() for metric in self.metrics]
+
+    def render(self, extra=(), **labels):
+        """Prometheus text for this process plus the ``extra`` families.
+
+        ``labels`` are added to this process's samples. Families with the
+        same name are merged, so a metric recorded in several processes is
+        still described once.
+        """
+        own = self.collect()
+        if labels:
+            for family in own:
+                family["samples"] = [
+                    [name, {**sample_labels, **labels}, value]
+                    for name, sample_labels, value in family["samples"]
+                ]
+        families = {}
+        for family in list(own) + list(extra):
+            merged = families.setdefault(family["name"], {**family, "samples": []})
+            merged["samples"].extend(family["samples"])
+
+        lines = []
+        for family in families.values():
+            if not family["samples"]:
+                continue
+            lines.append(f"# HELP {family['name']} {family['help']}")
+            lines.append(f"# TYPE {family['name']} {family['type']}")
+            for name, labels, value in family["samples"]:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+upstream_seconds = registry.register(Histogram(
+    "mvg_upstream_request_seconds", "Latency of upstream API calls",
+    ["upstream", "outcome"]
+))
+cache_requests = registry.register(Counter(
+    "mvg_cache_requests", "Cache lookups by result (hit, miss or stale)",
+    ["cache", "result"]
+))
+source_refresh_seconds = registry.register(Histogram(
+    "mvg_source_refresh_seconds", "Time to refresh one scheduler source",
+    ["source", "outcome"]
+))
+source_interval_seconds = registry.register(Gauge(
+    "mvg_source_interval_seconds", "Seconds until a scheduler source is polled again",
+    ["source"]
+))
+quota_remaining = registry.register(Gauge(
+    "mvg_quota_remaining_tokens", "Upstream calls left in the shared call budget",
+    ["upstream"]
+))
+quota_requests = registry.register(Counter(
+    "mvg_quota_requests", "Call budget requests by result (granted or denied)",
+    ["upstream", "result"]
+))
+connections_seconds = registry.register(Histogram(
+    "mvg_connections_seconds", "Time to match trams to connecting buses"
+))
+http_request_seconds = registry.register(Histogram(
+    "mvg_http_request_seconds", "Time to handle an HTTP request",
+    ["endpoint", "status"]
+))
+
+
+def dump(path):
+    """Write this process's samples to ``path`` for another process to merge."""
+    path = Path(path)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".metrics-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(registry.collect(), f, separators=(",", ":"))
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except Exception as e:
+        logger.error(f"Error writing metrics to {path}: {str(e)}")
+
+
+def load(path, **labels):
+    """Families dumped by another process, with ``labels`` added to each sample."""
+    try:
+        with open(path) as f:
+            families = json.load(f)
+    except FileNotFoundError:
+        return []
+    except Exception as e:
+        logger.error(f"Error reading metrics from {path}: {str(e)}")
+        return []
+    for family in families:
+        for sample in family["samples"]:
+            sample[1] = {**sample[1], **labels}
+    return families
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def load_workers(directory=WORKER_METRICS_DIR, exclude=None):
+    """Families dumped by the live workers, each sample labelled with its pid.
+
+    Dumps of workers that have exited are removed.
+    """
+    families = []
+    for path in sorted(Path(directory).glob("*.json")):
+        try:
+            pid = int(path.stem)
+        except ValueError:
+            continue
+        if pid == exclude:
+            continue
+        if not _alive(pid):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            continue
+        families.extend(load(path, worker=str(pid)))
+    return families
@@ -0,0 +1,49 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).resolve().parents[3]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.api.services.metrics import Counter, Histogram, Registry, load_workers
+
+
+def test_render_merges_families_from_other_processes():
+    registry = Registry()
+    requests = registry.register(Counter("requests", "Requests", ["path"]))
+    latency = registry.register(Histogram("latency", "Latency", buckets=(0.1, 1)))
+    requests.inc(path="/a")
+    requests.inc(path="/a")
+    latency.observe(0.5)
+
+    other = Registry()
+    other.register(Counter("requests", "Requests", ["path"])).inc(path="/b")
+    text = registry.render(other.collect())
+
+    assert text.count("# TYPE requests counter") == 1
+    assert 'requests_total{path="/a"} 2' in text
+    assert 'requests_total{path="/b"} 1' in text
+    assert 'latency_bucket{le="0.1"} 0' in text
+    assert 'latency_bucket{le="1"} 1' in text
+    assert 'latency_bucket{le="+Inf"} 1' in text
+    assert "latency_count 1" in text
+
+
+def test_worker_dumps_are_labelled_and_dead_workers_dropped(tmp_path):
+    registry = Registry()
+    registry.register(Counter("requests", "Requests")).inc()
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    for pid in (os.getpid(), exited.pid):
+        (tmp_path / f"{pid}.json").write_text(json.dumps(registry.collect()))
+
+    text = registry.render(load_workers(tmp_path), worker="self")
+
+    assert 'requests_total{worker="self"} 1' in text
+    assert f'requests_total{{worker="{os.getpid()}"}} 1' in text
+    assert str(exited.pid) not in text
+    assert not (tmp_path / f"{exited.pid}.json").exists()
@@ -0,0 +1,151 @@
+"""Call budgets for the upstream APIs, shared by every process.
+
+OpenWeather keys have a daily call quota and MVG throttles aggressive
+clients, so every upstream call first takes a token from its upstream's
+bucket. The bucket state lives in a small file under the data directory,
+locked for each update, so gunicorn workers and the refresher draw from
+one budget. Without ``fcntl`` (Windows) the file is not locked and each
+process should be given its own share of the budget.
+
+As a budget runs low, ``stretch()`` grows past 1 and callers lengthen
+their cache lifetimes and poll intervals by it.
+"""
+import logging
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+from backend.api.services.metrics import quota_remaining, quota_requests
+from backend.api.services.resilience import QuotaExceededError
+from backend.api.services.snapshot_store import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# Calls allowed per day (OpenWeather) and per minute (MVG); 0 disables a limit
+OPENWEATHER_DAILY_QUOTA = int(os.getenv("OPENWEATHER_DAILY_QUOTA", "1000"))
+MVG_CALLS_PER_MINUTE = int(os.getenv("MVG_CALLS_PER_MINUTE", "60"))
+# Below this share of the capacity, cache lifetimes start to stretch
+LOW_WATER = 0.25
+# Cache lifetimes are stretched at most this much, with an empty bucket
+MAX_STRETCH = 4.0
+
+# Tokens left and the time they were counted
+_STATE = struct.Struct("<dd")
+
+
+class TokenBucket:
+    """Token bucket of ``capacity`` tokens refilled at ``rate`` per second.
+
+    A ``capacity`` of None disables the limit.
+    """
+
+    def __init__(self, name, capacity, rate, path=None, clock=time.time):
+        self.name = name
+        self.capacity = capacity
+        self.rate = rate
+        self.path = Path(path) if path is not None else DATA_DIR / f"quota-{name}.bin"
+        self.clock = clock
+        self._lock = threading.Lock()
+        # Used when the shared file cannot be opened
+        self._state = None
+
+    def _update(self, take):
+        """Refill, then take ``take`` tokens if that many are left.
+
+        Returns whether they were taken and the tokens left.
+        """
+        with self._lock:
+            now = self.clock()
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            except OSError as e:
+                if self._state is None:
+                    logger.error(f"Quota file {self.path} unavailable, counting locally: {str(e)}")
+                taken, self._state = self._apply(self._state, now, take)
+                return taken, self._state[0]
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                raw = os.read(fd, _STATE.size)
+                state = _STATE.unpack(raw) if len(raw) == _STATE.size else None
+                taken, state = self._apply(state, now, take)
+                if take:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    os.write(fd, _STATE.pack(*state))
+                return taken, state[0]
+            finally:
+                # Closing the file releases the lock
+                os.close(fd)
+
+    def _apply(self, state, now, take):
+        if state is None:
+            tokens, updated = self.capacity, now
+        else:
+            tokens, updated = state
+        tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+        taken = tokens >= take
+        if taken:
+            tokens -= take
+        return taken, (tokens, now)
+
+    def try_acquire(self, tokens=1):
+        """Take ``tokens`` if the budget allows; True when taken."""
+        if self.capacity is None:
+            return True
+        taken, remaining = self._update(tokens)
+        quota_requests.inc(upstream=self.name, result="granted" if taken else "denied")
+        quota_remaining.set(remaining, upstream=self.name)
+        return taken
+
+    def acquire(self, tokens=1):
+        """Take ``tokens`` or raise QuotaExceededError."""
+        if not self.try_acquire(tokens):
+            raise QuotaExceededError(f"Call budget for {self.name} used up")
+
+    def remaining(self):
+        """Tokens currently left, or None without a limit."""
+        if self.capacity is None:
+            return None
+        remaining = self._update(0)[1]
+        quota_remaining.set(remaining, upstream=self.name)
+        return remaining
+
+    def stretch(self):
+        """Factor (1 to MAX_STRETCH) to lengthen cache lifetimes by."""
+        if self.capacity is None:
+            return 1.0
+        level = self.remaining() / self.capacity
+        if level >= LOW_WATER:
+            return 1.0
+        return 1.0 + (MAX_STRETCH - 1.0) * (1.0 - level / LOW_WATER)
+
+
+def _bucket(name, calls, per_seconds, burst_seconds):
+    # Bursts of up to ``burst_seconds`` worth of calls, ``calls`` per period
+    if calls <= 0:
+        return TokenBucket(name, None, 0)
+    rate = calls / per_seconds
+    return TokenBucket(name, rate * burst_seconds, rate)
+
+
+_quotas = {
+    "mvg": _bucket("mvg", MVG_CALLS_PER_MINUTE, 60, 60),
+    "openweather": _bucket("openweather", OPENWEATHER_DAILY_QUOTA, 86400, 3600),
+}
+
+
+def get_quota(name):
+    """The shared call budget of an upstream ("mvg" or "openweather")."""
+    return _quotas[name]
+
+
+def all_quotas():
+    return list(_quotas.values())
@@ -0,0 +1,40 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).resolve().parents[3]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.api.services.quota import MAX_STRETCH, TokenBucket
+from backend.api.services.resilience import QuotaExceededError
+
+
+def test_budget_is_shared_through_the_file(tmp_path):
+    now = [1000.0]
+    path = tmp_path / "quota-test.bin"
+    # Two buckets on one file, as in two worker processes
+    worker = TokenBucket("test", capacity=4, rate=0.5, path=path, clock=lambda: now[0])
+    refresher = TokenBucket("test", capacity=4, rate=0.5, path=path, clock=lambda: now[0])
+
+    assert worker.stretch() == 1.0
+    for bucket in (worker, refresher, worker, refresher):
+        bucket.acquire()
+    with pytest.raises(QuotaExceededError):
+        worker.acquire()
+    assert refresher.stretch() == MAX_STRETCH
+
+    # Refilled at half a token per second
+    now[0] += 2
+    assert refresher.try_acquire()
+    assert not worker.try_acquire()
+    assert worker.remaining() == 0
+
+
+def test_unlimited_bucket_never_denies(tmp_path):
+    bucket = TokenBucket("test", capacity=None, rate=0, path=tmp_path / "quota.bin")
+    assert all(bucket.try_acquire() for _ in range(100))
+    assert bucket.remaining() is None and bucket.stretch() == 1.0
+    assert not (tmp_path / "quota.bin").exists()
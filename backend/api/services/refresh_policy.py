@@ -0,0 +1,104 @@
+"""Adaptive poll intervals for the refresh scheduler's departure sources.
+
+A source's next interval is picked from the departures it just returned:
+
+- a departure within ``imminent`` seconds, or a delay that moved since the
+  previous fetch, polls every ``fast`` seconds;
+- when the next departure (live or from the timetable) is far off, as
+  outside service hours, polling pauses until ``lead`` seconds before it,
+  re-checking at least every ``max_interval`` seconds;
+- without any upcoming departure the source idles at ``max_interval``,
+  unless the previous fetch had some: a sudden empty result more likely
+  means a failed fetch than the end of service, so it is retried at
+  ``base``;
+- otherwise it polls every ``base`` seconds.
+
+Relative minutes are re-rendered on every publish, so backing off only
+delays live updates nobody is waiting for yet. With a ``quota``, intervals
+are stretched as the upstream's call budget runs low.
+"""
+import os
+import time
+
+from backend.api.services.departures import DepartureTable
+
+FAST_INTERVAL = int(os.getenv("MVG_REFRESH_FAST", "20"))
+MAX_INTERVAL = int(os.getenv("MVG_REFRESH_MAX", "3600"))
+# Seconds before the next departure polling resumes after a pause
+LEAD_SECONDS = 900
+# A delay change of at least this many seconds counts as moving
+DELAY_STEP = 60
+
+
+def _delays(table):
+    """Delay per departure, keyed by line, destination and planned time."""
+    return {
+        (table.lines[i], table.destinations[i], table.timestamps[i] - table.delays[i]):
+            table.delays[i]
+        for i in range(len(table))
+    }
+
+
+def _tables(value):
+    if not value:
+        return []
+    return [table for table in value.values() if isinstance(table, DepartureTable)]
+
+
+def delays_moving(previous, value, step=DELAY_STEP):
+    """Whether any departure in both values changed its delay by ``step``."""
+    before = {}
+    for table in _tables(previous):
+        before.update(_delays(table))
+    for table in _tables(value):
+        for key, delay in _delays(table).items():
+            if key in before and abs(delay - before[key]) >= step:
+                return True
+    return False
+
+
+def next_departure(value, now):
+    """Timestamp of the first departure at or after ``now``, or None."""
+    upcoming = None
+    for table in _tables(value):
+        for timestamp in table.timestamps:
+            if timestamp >= now:
+                if upcoming is None or timestamp < upcoming:
+                    upcoming = timestamp
+                break
+    return upcoming
+
+
+class RefreshPolicy:
+    """Picks a source's next poll interval from its previous and new value."""
+
+    def __init__(self, base, fast=FAST_INTERVAL, imminent=0, lead=LEAD_SECONDS,
+                 max_interval=MAX_INTERVAL, quota=None, clock=time.time):
+        self.base = base
+        self.quota = quota
+        self.fast = min(fast, base)
+        self.imminent = imminent
+        self.lead = lead
+        self.max_interval = max_interval
+        self.clock = clock
+
+    def __call__(self, previous, value):
+        interval = self._interval(previous, value)
+        if self.quota is not None:
+            interval = max(interval, min(interval * self.quota.stretch(), self.max_interval))
+        return interval
+
+    def _interval(self, previous, value):
+        now = self.clock()
+        upcoming = next_departure(value, now)
+        if upcoming is None:
+            if next_departure(previous, now) is not None:
+                return self.base
+            return self.max_interval
+
+        gap = upcoming - now
+        if gap - self.lead > self.base:
+            return min(gap - self.lead, self.max_interval)
+        if gap <= self.imminent or delays_moving(previous, value):
+            return self.fast
+        return self.base
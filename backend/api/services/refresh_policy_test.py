@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).resolve().parents[3]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.api.services.departures import Departure, DepartureTable
+from backend.api.services.refresh_policy import RefreshPolicy
+
+NOW = 100000
+
+
+def buses(*departures):
+    return {"buses": DepartureTable.from_departures(departures)}
+
+
+def bus(minutes, delay=0):
+    planned = NOW + minutes * 60
+    return Departure("189", "Unterföhring", planned + delay, is_live=True, delay=delay)
+
+
+def test_intervals_follow_the_next_departure():
+    policy = RefreshPolicy(base=60, fast=20, imminent=600, lead=900,
+                           max_interval=3600, clock=lambda: NOW)
+
+    assert policy(None, buses(bus(5))) == 20           # imminent
+    assert policy(None, buses(bus(14))) == 60          # regular service
+    assert policy(None, buses(bus(30))) == 900         # wake 15 minutes before
+    assert policy(None, buses(bus(10 * 60))) == 3600   # overnight, re-check hourly
+    assert policy(None, buses()) == 3600               # no service at all
+
+    # A delay that moved polls fast even with the bus further off
+    assert policy(buses(bus(14)), buses(bus(14, delay=120))) == 20
+    # A sudden empty result is retried at the regular interval
+    assert policy(buses(bus(14)), buses()) == 60
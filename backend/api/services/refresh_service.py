@@ -0,0 +1,490 @@
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; responses fall back to gzip
+    brotli = None
+
+from backend.api.services.config_service import config
+from backend.api.services.departures import DepartureTable, json_default
+from backend.api.services.tram_service import CACHE_SECONDS as TRAM_CACHE_SECONDS, get_tram_departures
+from backend.api.services.bus_service import (
+    LIVE_CACHE_TTL as BUS_CACHE_SECONDS, get_bus_departures, get_scheduled_bus_departures
+)
+from backend.api.services.connection_service import calculate_connections
+from backend.api.services.weather_service import weather_service, BREAKER_NAME as WEATHER_BREAKER
+from backend.api.services.fetch_service import breaker_name
+from backend.api.services.metrics import source_interval_seconds, source_refresh_seconds
+from backend.api.services.resilience import is_degraded
+from backend.api.services.quota import get_quota
+from backend.api.services.refresh_policy import FAST_INTERVAL, RefreshPolicy
+from backend.api.services.snapshot_store import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+# A published snapshot is never mutated; readers can share it freely.
+# ``data`` maps each configured board name to its /api/data payload.
+# ``version`` only advances when some board's content changed, and
+# ``changes`` holds, per board, the sections that differ from the previous
+# snapshot.
+# ``bodies`` holds each board's payload pre-serialized by the encoder, so
+# requests never serialize; unchanged boards keep their previous body.
+# ``epoch`` is the publishing scheduler's start time: versions restart at 1
+# with every start, so a version only identifies a snapshot together with
+# its epoch.
+# ``deltas``, when set, holds encoded /api/data/delta bodies keyed by board
+# and cursor version, as published by the refresher process.
+Snapshot = namedtuple(
+    "Snapshot", ["data", "created_at", "version", "changes", "bodies", "epoch", "deltas"],
+    defaults=(None,)
+)
+
+# A serialized payload with its compressed variants and content-hash ETag
+ResponseBody = namedtuple("ResponseBody", ["raw", "gzip", "br", "etag"])
+
+# Recently published versions kept for /api/data/delta cursors
+HISTORY_SIZE = 32
+# Derived bodies cached per snapshot version
+MAX_DERIVED_BODIES = 256
+
+
+def encode_body(payload):
+    """Serialize a payload once and precompress it."""
+    raw = json.dumps(
+        payload, separators=(",", ":"), sort_keys=True, default=json_default
+    ).encode("utf-8")
+    return ResponseBody(
+        raw=raw,
+        gzip=gzip.compress(raw, compresslevel=6),
+        br=brotli.compress(raw, quality=5) if brotli is not None else None,
+        etag=hashlib.blake2b(raw, digest_size=16).hexdigest()
+    )
+
+
+class SnapshotHistory:
+    """Bounded ring of the most recently published snapshots."""
+
+    def __init__(self, maxlen=HISTORY_SIZE):
+        self._ring = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, snapshot):
+        with self._lock:
+            if not self._ring or self._ring[-1].version != snapshot.version:
+                self._ring.append(snapshot)
+
+    def get(self, version):
+        """The snapshot published as ``version``, or None once it aged out."""
+        with self._lock:
+            for snapshot in reversed(self._ring):
+                if snapshot.version == version:
+                    return snapshot
+        return None
+
+    def snapshots(self):
+        """The kept snapshots, oldest first."""
+        with self._lock:
+            return list(self._ring)
+
+
+class VersionedBodyCache:
+    """Encoded bodies derived from one snapshot version.
+
+    Entries are keyed by whatever identifies the derived payload and are
+    dropped as soon as another version is asked for. Versions restart with
+    every epoch, so a version only counts as the same together with its
+    epoch.
+    """
+
+    def __init__(self, encoder=encode_body, max_size=MAX_DERIVED_BODIES):
+        self.encoder = encoder
+        self.max_size = max_size
+        self._version = None
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    def get(self, snapshot, key, build):
+        """The encoded ``build()`` payload for ``key`` at this snapshot."""
+        version = (snapshot.epoch, snapshot.version)
+        with self._lock:
+            if self._version != version:
+                self._version = version
+                self._bodies = {}
+            body = self._bodies.get(key)
+        if body is not None:
+            return body
+
+        body = self.encoder(build())
+        with self._lock:
+            if self._version == version and len(self._bodies) < self.max_size:
+                self._bodies[key] = body
+        return body
+
+
+class RefreshScheduler:
+    """Refresh upstream sources in the background and publish snapshots.
+
+    Each source is fetched on its own interval by a single daemon thread;
+    sources that fall due together are fetched concurrently.
+    After every tick that refreshed a source (or at least every
+    ``publish_interval`` seconds, so relative minutes stay current) the
+    builder turns the latest source values into a new snapshot, which
+    replaces the previous one with a single reference swap. Keys listed in
+    ``volatile_keys`` (such as a timestamp) are ignored when deciding what
+    changed.
+
+    A source fails by raising or returning None. Its last good value is
+    then kept, and the builder is told which sources failed so it can mark
+    their sections stale.
+
+    With a ``store``, the last good source values are saved after every
+    refresh and the fresh ones are restored when the scheduler starts, so a
+    restarted instance publishes its first snapshot without waiting on any
+    upstream.
+
+    With a ``heartbeat`` path, the file is touched after every tick, so a
+    supervisor can tell a wedged scheduler from a slow upstream.
+    """
+
+    def __init__(self, builder, publish_interval=15, tick=1.0,
+                 volatile_keys=("lastUpdated",), encoder=encode_body, store=None,
+                 heartbeat=None):
+        self.builder = builder
+        self.encoder = encoder
+        self.store = store
+        self.heartbeat = Path(heartbeat) if heartbeat is not None else None
+        self.volatile_keys = frozenset(volatile_keys)
+        self.publish_interval = publish_interval
+        self.tick = tick
+        self.sources = {}
+        self.listeners = []
+        self.history = SnapshotHistory()
+        self.epoch = int(time.time())
+        self._values = {}
+        self._fetched_at = {}
+        # Sources whose latest refresh failed
+        self._failed = set()
+        self._snapshot = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._published = threading.Condition()
+        self._executor = ThreadPoolExecutor(
+            max_workers=4, thread_name_prefix="refresh-source"
+        )
+
+    def add_source(self, name, fetch, interval, policy=None, fallback=None):
+        """Register an upstream source fetched every ``interval`` seconds.
+
+        With a ``policy``, ``policy(previous, value)`` picks the interval
+        after each refresh instead; ``interval`` is used if it fails. With
+        a ``fallback``, ``fallback()`` stands in for the value until the
+        first successful fetch; it is never saved to the store.
+        """
+        self.sources[name] = {
+            "fetch": fetch, "interval": interval, "policy": policy,
+            "fallback": fallback, "next_run": 0
+        }
+
+    def add_listener(self, listener):
+        """Call ``listener(snapshot)`` whenever a new version is published."""
+        self.listeners.append(listener)
+
+    @property
+    def current(self):
+        """The latest snapshot, without starting the scheduler."""
+        return self._snapshot
+
+    def get_snapshot(self):
+        """Return the latest snapshot, building the first one if needed."""
+        self.start()
+        if self._snapshot is None:
+            self.refresh_now()
+        return self._snapshot
+
+    def wait_for_update(self, version, timeout=None, epoch=None):
+        """Block until a snapshot newer than ``version`` is published.
+
+        Returns the newer snapshot, or None if ``timeout`` seconds pass first.
+        A version of another ``epoch`` is out of date at once.
+        """
+        if epoch is not None and epoch != self.epoch and self._snapshot is not None:
+            return self._snapshot
+        with self._published:
+            self._published.wait_for(
+                lambda: self._snapshot is not None and self._snapshot.version > version,
+                timeout=timeout
+            )
+            snapshot = self._snapshot
+        if snapshot is not None and snapshot.version > version:
+            return snapshot
+        return None
+
+    def start(self):
+        """Start the background thread (idempotent)."""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._restore()
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="refresh-scheduler", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def refresh_now(self):
+        """Fetch every source immediately and publish a snapshot."""
+        with self._refresh_lock:
+            if self._snapshot is not None:
+                return
+            self._refresh_sources(list(self.sources), time.monotonic())
+            self._publish()
+
+    def _restore(self):
+        if self.store is None or self._snapshot is not None:
+            return
+        values, fetched_at = self.store.load()
+        values = {name: value for name, value in values.items() if name in self.sources}
+        if not values:
+            return
+        with self._refresh_lock:
+            self._values.update(values)
+            self._fetched_at.update(fetched_at)
+            try:
+                self._publish()
+                logger.info(f"Restored {len(values)} sources from {self.store.path}")
+            except Exception as e:
+                logger.error(f"Error publishing restored snapshot: {str(e)}")
+
+    def _refresh_sources(self, names, now):
+        # Sources are independent, so refresh them side by side
+        refreshed = list(self._executor.map(lambda name: self._refresh_source(name, now), names))
+        if any(refreshed) and self.store is not None:
+            # Only fetched values: fallbacks are no data worth restoring
+            fetched_at = dict(self._fetched_at)
+            values = {
+                name: value for name, value in self._values.items() if name in fetched_at
+            }
+            self.store.save(values, fetched_at)
+
+    def _refresh_source(self, name, now):
+        """Refresh one source; True when it returned a new value."""
+        source = self.sources[name]
+        previous = self._values.get(name)
+        start = time.perf_counter()
+        try:
+            value = source["fetch"]()
+            if value is None:
+                logger.error(f"Error refreshing {name}: no data")
+        except Exception as e:
+            value = None
+            logger.error(f"Error refreshing {name}: {str(e)}")
+        source_refresh_seconds.observe(
+            time.perf_counter() - start, source=name,
+            outcome="error" if value is None else "ok"
+        )
+
+        if value is not None:
+            self._values[name] = value
+            self._fetched_at[name] = time.time()
+            self._failed.discard(name)
+        else:
+            # Keep serving the last good value, marked stale
+            self._failed.add(name)
+            if name not in self._values and source["fallback"] is not None:
+                try:
+                    self._values[name] = source["fallback"]()
+                except Exception as e:
+                    logger.error(f"Error in fallback of {name}: {str(e)}")
+
+        interval = self._next_interval(name, source, previous)
+        source_interval_seconds.set(interval, source=name)
+        source["next_run"] = now + interval
+        return value is not None
+
+    def _next_interval(self, name, source, previous):
+        if source["policy"] is None:
+            return source["interval"]
+        try:
+            return source["policy"](previous, self._values.get(name))
+        except Exception as e:
+            logger.error(f"Error in refresh policy of {name}: {str(e)}")
+            return source["interval"]
+
+    def _diff(self, previous, data):
+        changes = {}
+        for board, payload in data.items():
+            before = previous.data.get(board) or {}
+            changed = {
+                key: value for key, value in payload.items()
+                if key not in self.volatile_keys and before.get(key) != value
+            }
+            if changed:
+                changes[board] = changed
+        return changes
+
+    def _publish(self):
+        data = self.builder(dict(self._values), frozenset(self._failed))
+        previous = self._snapshot
+        if previous is None:
+            version, changes = 1, {board: payload for board, payload in data.items()}
+        else:
+            changes = self._diff(previous, data)
+            version = previous.version + 1 if changes else previous.version
+
+        bodies = dict(previous.bodies) if previous is not None else {}
+        for board in changes:
+            bodies[board] = self.encoder(data[board])
+
+        snapshot = Snapshot(
+            data=data,
+            created_at=time.monotonic(),
+            version=version,
+            changes=changes,
+            bodies=bodies,
+            epoch=self.epoch
+        )
+        with self._published:
+            self._snapshot = snapshot
+            self._published.notify_all()
+
+        if previous is None or version != previous.version:
+            self.history.add(snapshot)
+            for listener in self.listeners:
+                try:
+                    listener(snapshot)
+                except Exception as e:
+                    logger.error(f"Error in snapshot listener: {str(e)}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            with self._refresh_lock:
+                due = [
+                    name for name, source in self.sources.items()
+                    if now >= source["next_run"]
+                ]
+                self._refresh_sources(due, now)
+                refreshed = bool(due)
+                snapshot = self._snapshot
+                if refreshed or snapshot is None or (
+                    now - snapshot.created_at >= self.publish_interval
+                ):
+                    try:
+                        self._publish()
+                    except Exception as e:
+                        logger.error(f"Error publishing snapshot: {str(e)}")
+            self._beat()
+            self._stop.wait(self.tick)
+
+    def _beat(self):
+        if self.heartbeat is None:
+            return
+        try:
+            self.heartbeat.parent.mkdir(parents=True, exist_ok=True)
+            self.heartbeat.touch()
+        except OSError as e:
+            logger.error(f"Error touching heartbeat {self.heartbeat}: {str(e)}")
+
+
+def build_board_data(board, values, current_timestamp, failed=frozenset()):
+    """Build the /api/data payload for one board.
+
+    ``failed`` names the sources whose latest refresh failed.
+    """
+    trams = values.get(f"trams:{board.name}") or {}
+    buses = values.get(f"buses:{board.name}") or {}
+    empty = DepartureTable.empty()
+
+    # Render relative minutes for every departure in one pass per table
+    trams = {
+        direction: trams.get(direction, empty).render(current_timestamp)
+        for direction in board.trams.direction_names
+    }
+    buses = {"buses": buses.get("buses", empty).render(current_timestamp)}
+
+    # Calculate connections for trams heading toward the transfer
+    direction = board.transfer.from_direction
+    trams[direction] = calculate_connections(
+        northbound_trams=trams[direction],
+        buses=buses,
+        transfer=board.transfer,
+        tram_station=board.trams.station.key,
+        bus_station=board.buses.station.key
+    )
+
+    return {
+        "trams": trams,
+        "buses": buses,
+        "weather": values.get("weather"),
+        "stale": stale_sections(board, failed),
+        "lastUpdated": int(current_timestamp)
+    }
+
+
+def stale_sections(board, failed=frozenset()):
+    """Sections served from last good data because an upstream is failing."""
+    upstreams = (
+        ("trams", f"trams:{board.name}",
+         [breaker_name(station_id) for station_id in board.trams.station_ids]),
+        ("buses", f"buses:{board.name}",
+         [breaker_name(station_id) for station_id in board.buses.station_ids]),
+        ("weather", "weather", [WEATHER_BREAKER]),
+    )
+    return [
+        section for section, source, names in upstreams
+        if source in failed or is_degraded(names)
+    ]
+
+
+def build_combined_data(values, failed=frozenset()):
+    """Build the /api/data payloads of every board from the latest values."""
+    current_timestamp = datetime.now().timestamp()
+    return {
+        name: build_board_data(board, values, current_timestamp, failed)
+        for name, board in config.boards.items()
+    }
+
+
+refresh_scheduler = RefreshScheduler(build_combined_data, store=SnapshotStore())
+# Departure sources are polled on adaptive intervals (see refresh_policy),
+# so they only reuse the services' caches within the fastest interval.
+# The weather service keeps its own upstream cache, so polling it more often
+# than its cache window just returns the cached value; relative minutes are
+# rendered at publish time
+for _name in config.boards:
+    refresh_scheduler.add_source(
+        f"trams:{_name}", partial(get_tram_departures, _name, max_age=FAST_INTERVAL),
+        interval=TRAM_CACHE_SECONDS,
+        policy=RefreshPolicy(base=TRAM_CACHE_SECONDS, quota=get_quota("mvg"))
+    )
+    # A bus within ten minutes is when a connection is decided
+    refresh_scheduler.add_source(
+        f"buses:{_name}", partial(get_bus_departures, _name, max_age=FAST_INTERVAL),
+        interval=BUS_CACHE_SECONDS,
+        policy=RefreshPolicy(base=BUS_CACHE_SECONDS, imminent=600, quota=get_quota("mvg")),
+        fallback=partial(get_scheduled_bus_departures, _name)
+    )
+refresh_scheduler.add_source(
+    "weather", partial(weather_service.get_weather, fallback=False), interval=300,
+    fallback=partial(weather_service.get_fallback_data, "API unavailable")
+)
@@ -0,0 +1,86 @@
+import sys
+import time
+from pathlib import Path
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).resolve().parents[3]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.api.services.refresh_service import RefreshScheduler, VersionedBodyCache
+from backend.api.services.snapshot_store import SnapshotStore
+
+
+def _builder(values, failed):
+    return {"default": {
+        "trams": values.get("trams"), "weather": values.get("weather"), "stale": sorted(failed)
+    }}
+
+
+def _failing():
+    raise ConnectionError("upstream down")
+
+
+def test_failed_refresh_keeps_and_persists_the_last_good_values(tmp_path):
+    store = SnapshotStore(tmp_path / "snapshot.json")
+    warm = RefreshScheduler(_builder, store=store)
+    warm.add_source("trams", lambda: [1, 2, 3, 4], interval=30)
+    warm.add_source("weather", lambda: {"temp": 12}, interval=300)
+    warm.refresh_now()
+
+    # Restarted while both upstreams fail
+    restarted = RefreshScheduler(_builder, store=store)
+    restarted.add_source("trams", lambda: None, interval=30)
+    restarted.add_source("weather", _failing, interval=300)
+    restarted._restore()
+    restarted._refresh_sources(["trams", "weather"], 0)
+    restarted._publish()
+
+    board = restarted._snapshot.data["default"]
+    assert board["trams"] == [1, 2, 3, 4] and board["weather"] == {"temp": 12}
+    assert board["stale"] == ["trams", "weather"]
+    assert store.load()[0] == {"trams": [1, 2, 3, 4], "weather": {"temp": 12}}
+
+
+def test_fallback_stands_in_until_the_first_fetch(tmp_path):
+    store = SnapshotStore(tmp_path / "snapshot.json")
+    scheduler = RefreshScheduler(_builder, store=store)
+    scheduler.add_source("weather", _failing, interval=300, fallback=lambda: {"temp": None})
+    scheduler.refresh_now()
+
+    assert scheduler._snapshot.data["default"]["weather"] == {"temp": None}
+    assert not (tmp_path / "snapshot.json").exists()
+
+
+def test_body_cache_is_not_shared_across_epochs():
+    cache = VersionedBodyCache(encoder=lambda payload: payload)
+    bodies = []
+    for epoch, weather in ((1000, 12), (2000, 3)):
+        # A restarted refresher publishes version 1 again
+        scheduler = RefreshScheduler(_builder, store=None)
+        scheduler.epoch = epoch
+        scheduler.add_source("weather", lambda: weather, interval=60)
+        scheduler._refresh_sources(["weather"], 0)
+        scheduler._publish()
+        snapshot = scheduler.current
+        assert snapshot.version == 1
+        bodies.append(cache.get(snapshot, "weather", lambda: snapshot.data["default"]["weather"]))
+
+    assert bodies == [12, 3]
+
+
+def test_scheduler_loop_touches_its_heartbeat(tmp_path):
+    heartbeat = tmp_path / "run" / "heartbeat"
+    scheduler = RefreshScheduler(_builder, tick=0.01, heartbeat=heartbeat)
+    scheduler.add_source("weather", lambda: 12, interval=60)
+    scheduler.start()
+    try:
+        deadline = time.monotonic() + 5
+        while not heartbeat.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        first = heartbeat.stat().st_mtime_ns
+        while heartbeat.stat().st_mtime_ns == first and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert heartbeat.stat().st_mtime_ns > first
+    finally:
+        scheduler.stop()
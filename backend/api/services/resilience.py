@@ -0,0 +1,144 @@
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failures that open a breaker
+FAILURE_THRESHOLD = 3
+# Backoff after the first opening, doubled on every further failed trial
+BASE_BACKOFF = 10
+MAX_BACKOFF = 600
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+class QuotaExceededError(CircuitOpenError):
+    """Raised instead of calling an upstream whose call budget is used up."""
+
+
+class BudgetExceededError(TimeoutError):
+    """Raised when a request's latency budget is used up."""
+
+
+class CircuitBreaker:
+    """Per-endpoint circuit breaker with jittered exponential backoff.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    calls fail fast with CircuitOpenError. Once the backoff has passed a
+    single trial call is let through (half-open): success closes the
+    breaker, failure reopens it with twice the backoff.
+    """
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD,
+                 base_backoff=BASE_BACKOFF, max_backoff=MAX_BACKOFF):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.openings = 0
+        self.retry_at = 0
+        self.last_success = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.failures < self.failure_threshold:
+            return "closed"
+        if time.monotonic() < self.retry_at:
+            return "open"
+        return "half_open"
+
+    def before_call(self, quota=None):
+        """Raise CircuitOpenError unless a call may go upstream now.
+
+        With a ``quota`` the call also takes a token from it, but only once
+        the breaker lets it through, so an open breaker spends no budget.
+        A denied token frees the half-open trial again.
+        """
+        with self._lock:
+            state = self.state
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+            elif state != "closed":
+                raise CircuitOpenError(f"Circuit open for {self.name}")
+        if quota is None:
+            return
+        try:
+            quota.acquire()
+        except QuotaExceededError:
+            with self._lock:
+                self._trial_running = False
+            raise
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.openings = 0
+            self._trial_running = False
+            self.last_success = time.time()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.failures >= self.failure_threshold:
+                backoff = min(self.max_backoff, self.base_backoff * 2 ** self.openings)
+                # Jitter keeps breakers for several endpoints from retrying in lockstep
+                backoff *= random.uniform(0.5, 1.0)
+                self.retry_at = time.monotonic() + backoff
+                self.openings += 1
+                logger.warning(f"Circuit for {self.name} open for {backoff:.0f}s")
+
+    def call(self, fn, *args, **kwargs):
+        """Call ``fn`` through the breaker."""
+        self.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+
+class LatencyBudget:
+    """Time allowance shared by all upstream calls made for one refresh."""
+
+    def __init__(self, seconds):
+        self.deadline = time.monotonic() + seconds
+
+    def remaining(self):
+        return self.deadline - time.monotonic()
+
+    def timeout(self, cap):
+        """Timeout for the next call: ``cap`` or what is left, if less."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise BudgetExceededError("Latency budget exhausted")
+        return min(cap, remaining)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """The shared breaker for an upstream endpoint."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def is_degraded(names):
+    """True when any of the named breakers is not closed."""
+    return any(
+        name in _breakers and _breakers[name].state != "closed" for name in names
+    )
@@ -0,0 +1,68 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).resolve().parents[3]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.api.services.quota import TokenBucket
+from backend.api.services.resilience import (
+    CircuitBreaker, CircuitOpenError, QuotaExceededError
+)
+
+
+def _fail():
+    raise ConnectionError("upstream down")
+
+
+def test_breaker_opens_and_recovers_after_trial():
+    breaker = CircuitBreaker("test", failure_threshold=2, base_backoff=10)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+    assert breaker.state == "open"
+
+    # Fails fast while open
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "ok")
+
+    # Once the backoff is over a single trial goes through and closes it
+    breaker.retry_at = 0
+    assert breaker.state == "half_open"
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_reopens_with_longer_backoff():
+    breaker = CircuitBreaker("test", failure_threshold=1, base_backoff=10, max_backoff=600)
+    with pytest.raises(ConnectionError):
+        breaker.call(_fail)
+    breaker.retry_at = 0
+    with pytest.raises(ConnectionError):
+        breaker.call(_fail)
+    assert breaker.state == "open"
+    assert breaker.openings == 2
+
+
+def test_open_breaker_spends_no_budget_and_denied_trial_is_freed(tmp_path):
+    quota = TokenBucket("test", capacity=1, rate=0, path=tmp_path / "quota.bin")
+    breaker = CircuitBreaker("test", failure_threshold=1, base_backoff=10)
+    with pytest.raises(ConnectionError):
+        breaker.call(_fail)
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call(quota)
+    assert quota.remaining() == 1
+
+    # The half-open trial takes the last token; without one it is released
+    breaker.retry_at = 0
+    breaker.before_call(quota)
+    breaker.record_failure()
+    breaker.retry_at = 0
+    with pytest.raises(QuotaExceededError):
+        breaker.before_call(quota)
+    assert breaker.state == "half_open"
+    breaker.before_call()
@@ -0,0 +1,75 @@
+"""Single sections of a board (trams, buses, connections, weather).
+
+Each section is cut from the published snapshot, so serving one costs no
+upstream call and no recomputation. Projected bodies are encoded once per
+snapshot version and reused until the next one.
+"""
+from backend.api.services.refresh_service import VersionedBodyCache
+
+# Fields describing a departure itself, without transfer information
+DEPARTURE_FIELDS = ("line", "destination", "timestamp", "minutes", "is_live",
+                    "delay", "predicted_delay")
+CONNECTION_FIELDS = ("line", "destination", "timestamp", "minutes", "is_live",
+                     "delay", "connection", "connection_options")
+
+
+def _as_dict(item):
+    return item.to_json() if hasattr(item, "to_json") else item
+
+
+def _project(item, fields):
+    item = _as_dict(item)
+    return {key: item[key] for key in fields if key in item}
+
+
+def _project_list(items, fields, limit):
+    if limit is not None:
+        items = items[:limit]
+    return [_project(item, fields) for item in items]
+
+
+def _trams(board_data, fields, limit):
+    return {
+        direction: _project_list(departures, fields or DEPARTURE_FIELDS, limit)
+        for direction, departures in board_data["trams"].items()
+    }
+
+
+def _buses(board_data, fields, limit):
+    return {"buses": _project_list(board_data["buses"]["buses"], fields or DEPARTURE_FIELDS, limit)}
+
+
+def _connections(board_data, fields, limit, direction):
+    trams = board_data["trams"].get(direction, [])
+    return {"connections": _project_list(trams, fields or CONNECTION_FIELDS, limit)}
+
+
+def _weather(board_data, fields, limit):
+    weather = board_data.get("weather") or {}
+    if fields:
+        weather = {key: weather[key] for key in fields if key in weather}
+    return {"weather": weather}
+
+
+SECTIONS = ("trams", "buses", "connections", "weather")
+
+
+def build_section(board, board_data, section, fields=None, limit=None):
+    """The payload of one section of a board, projected to ``fields``."""
+    if section == "trams":
+        payload = _trams(board_data, fields, limit)
+    elif section == "buses":
+        payload = _buses(board_data, fields, limit)
+    elif section == "connections":
+        payload = _connections(board_data, fields, limit, board.transfer.from_direction)
+    elif section == "weather":
+        payload = _weather(board_data, fields, limit)
+    else:
+        raise KeyError(section)
+    payload["lastUpdated"] = board_data["lastUpdated"]
+    if section in board_data.get("stale", ()):
+        payload["stale"] = True
+    return payload
+
+
+section_cache = VersionedBodyCache()
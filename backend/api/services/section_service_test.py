@@ -0,0 +1,38 @@
+import sys
+from pathlib import Path
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).resolve().parents[3]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.api.services.config_service import config
+from backend.api.services.departures import Connection, Departure
+from backend.api.services.section_service import build_section
+
+TRAM = Departure("16", "St. Emmeram", 1000, is_live=True, minutes=2).with_connections(
+    [Connection(1500, 3, True, "low", reliability=0.9)]
+)
+BOARD_DATA = {
+    "trams": {"northbound": [TRAM, TRAM], "southbound": []},
+    "buses": {"buses": [Departure("189", "Unterföhring", 1500, is_live=False, minutes=10)]},
+    "weather": {"temp": 12, "humidity": 70},
+    "stale": ["weather"],
+    "lastUpdated": 900,
+}
+
+
+def test_sections_are_projected_and_limited():
+    board = config.get_board()
+
+    trams = build_section(board, BOARD_DATA, "trams", fields=("line", "minutes"), limit=1)
+    assert trams == {
+        "northbound": [{"line": "16", "minutes": 2}], "southbound": [], "lastUpdated": 900
+    }
+
+    connections = build_section(board, BOARD_DATA, "connections", limit=1)
+    assert connections["connections"][0]["connection"]["reliability"] == 0.9
+    assert "connection" not in build_section(board, BOARD_DATA, "trams")["northbound"][0]
+
+    weather = build_section(board, BOARD_DATA, "weather", fields=("temp",))
+    assert weather == {"weather": {"temp": 12}, "stale": True, "lastUpdated": 900}
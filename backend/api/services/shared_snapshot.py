@@ -0,0 +1,190 @@
+"""Hand published snapshots from the refresher process to server workers.
+
+The refresher writes every new snapshot version to a single file. Each
+body is stored already serialized and compressed, so workers only read
+bytes and never fetch, render or compress anything themselves. The same
+goes for /api/data/delta: the deltas from each version in the refresher's
+history come precomputed with every snapshot, so any worker can answer any
+cursor, whichever versions it happened to see itself. The file is
+replaced atomically and stays in the page cache, so in practice every worker
+reads it from memory.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from backend.api.services.delta_service import encode_deltas
+from backend.api.services.refresh_service import ResponseBody, Snapshot, SnapshotHistory
+from backend.api.services.snapshot_store import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+PUBLISHED_FILE = "published.bin"
+# How often (seconds) readers look for a newer version
+CHECK_INTERVAL = 0.5
+
+
+def _default_path():
+    return Path(os.getenv("MVG_PUBLISHED_PATH", DATA_DIR / PUBLISHED_FILE))
+
+
+class SharedSnapshotWriter:
+    """Writes each new snapshot version for the workers to pick up.
+
+    Layout: one JSON header line with the epoch and version, the changed
+    sections and the offset and length of every body variant, followed by
+    the bodies. Deltas are taken from the versions kept in ``history``
+    (the scheduler's); without one only the full boards are published.
+    """
+
+    def __init__(self, path=None, history=None):
+        self.path = Path(path or _default_path())
+        self.history = history if history is not None else SnapshotHistory(maxlen=0)
+
+    def write(self, snapshot):
+        blobs = []
+        offset = 0
+
+        def locate(body):
+            nonlocal offset
+            entry = {"etag": body.etag}
+            for variant in ("raw", "gzip", "br"):
+                blob = getattr(body, variant)
+                if blob is None:
+                    entry[variant] = None
+                    continue
+                entry[variant] = [offset, len(blob)]
+                blobs.append(blob)
+                offset += len(blob)
+            return entry
+
+        bodies = {board: locate(body) for board, body in snapshot.bodies.items()}
+        deltas = [
+            [board, since, locate(body)]
+            for (board, since), body in encode_deltas(self.history, snapshot).items()
+        ]
+
+        header = json.dumps({
+            "epoch": snapshot.epoch,
+            "version": snapshot.version,
+            "published_at": time.time(),
+            "changes": {board: sorted(changed) for board, changed in snapshot.changes.items()},
+            "bodies": bodies,
+            "deltas": deltas
+        }, separators=(",", ":")).encode("utf-8")
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self.path.parent, prefix=".published-", suffix=".tmp"
+            )
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(header + b"\n")
+                    f.writelines(blobs)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except Exception as e:
+            logger.error(f"Error writing published snapshot to {self.path}: {str(e)}")
+
+
+def read_snapshot(path):
+    """Load a snapshot written by SharedSnapshotWriter."""
+    with open(path, "rb") as f:
+        header = json.loads(f.readline())
+        payload = f.read()
+
+    def blob(location):
+        if location is None:
+            return None
+        offset, length = location
+        return payload[offset:offset + length]
+
+    def body(entry):
+        return ResponseBody(
+            raw=blob(entry["raw"]),
+            gzip=blob(entry["gzip"]),
+            br=blob(entry["br"]),
+            etag=entry["etag"]
+        )
+
+    bodies = {board: body(entry) for board, entry in header["bodies"].items()}
+    data = {board: json.loads(body.raw) for board, body in bodies.items()}
+    changes = {
+        board: {key: data[board][key] for key in keys}
+        for board, keys in header["changes"].items()
+    }
+    # Age the snapshot from when the refresher published it, not when read
+    age = max(0.0, time.time() - header["published_at"])
+    return Snapshot(
+        data=data,
+        created_at=time.monotonic() - age,
+        version=header["version"],
+        changes=changes,
+        bodies=bodies,
+        epoch=header["epoch"],
+        deltas={(board, since): body(entry) for board, since, entry in header["deltas"]}
+    )
+
+
+class SharedSnapshotReader:
+    """Worker-side stand-in for the RefreshScheduler.
+
+    Offers the same ``get_snapshot`` / ``wait_for_update`` interface, backed
+    by the file the refresher process publishes. Makes no upstream calls.
+    """
+
+    def __init__(self, path=None, check_interval=CHECK_INTERVAL):
+        self.path = Path(path or _default_path())
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._file_id = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def get_snapshot(self):
+        """Return the latest published snapshot, or None before the first one."""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            with self._lock:
+                if time.monotonic() - self._checked_at >= self.check_interval:
+                    self._reload()
+                    self._checked_at = time.monotonic()
+        return self._snapshot
+
+    def wait_for_update(self, version, timeout=None, epoch=None):
+        """Poll until a snapshot newer than ``version`` appears.
+
+        Once the refresher restarted (another ``epoch``) any snapshot is newer.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self.get_snapshot()
+            if snapshot is not None and (
+                snapshot.version > version or (epoch is not None and snapshot.epoch != epoch)
+            ):
+                return snapshot
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(self.check_interval)
+
+    def _reload(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        # A rename gives the file a new inode, so this catches every publish
+        file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if file_id == self._file_id:
+            return
+        try:
+            self._snapshot = read_snapshot(self.path)
+            self._file_id = file_id
+        except Exception as e:
+            logger.error(f"Error reading published snapshot {self.path}: {str(e)}")
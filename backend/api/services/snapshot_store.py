@@ -0,0 +1,84 @@
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from backend.api.services.departures import DepartureTable
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
+# Mounted as a volume in docker-compose, so snapshots survive restarts
+DATA_DIR = Path(os.getenv("MVG_DATA_DIR", PROJECT_ROOT / "data"))
+SNAPSHOT_FILE = "snapshot.json"
+# Restored values older than this (seconds) are discarded
+MAX_AGE = int(os.getenv("MVG_SNAPSHOT_MAX_AGE", 3600))
+
+_TABLE_TAG = "__departure_table__"
+
+
+def _encode(obj):
+    if isinstance(obj, DepartureTable):
+        return {_TABLE_TAG: obj.to_columns()}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _decode(obj):
+    if _TABLE_TAG in obj:
+        return DepartureTable.from_columns(obj[_TABLE_TAG])
+    return obj
+
+
+class SnapshotStore:
+    """Last good value of every source, kept in a file on local disk.
+
+    Each save writes a temporary file next to the snapshot and renames it
+    over the old one, so a crash mid-write never leaves a torn file behind.
+    """
+
+    def __init__(self, path=None, max_age=MAX_AGE):
+        self.path = Path(path or DATA_DIR / SNAPSHOT_FILE)
+        self.max_age = max_age
+
+    def save(self, values, fetched_at):
+        """Persist ``values`` with the wall-clock time each was fetched."""
+        entries = {
+            name: {"fetched_at": fetched_at[name], "value": value}
+            for name, value in values.items()
+            if name in fetched_at
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self.path.parent, prefix=".snapshot-", suffix=".tmp"
+            )
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(entries, f, separators=(",", ":"), default=_encode)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except Exception as e:
+            logger.error(f"Error saving snapshot to {self.path}: {str(e)}")
+
+    def load(self, now=None):
+        """Return ``(values, fetched_at)`` for the entries still fresh enough."""
+        now = time.time() if now is None else now
+        try:
+            with open(self.path) as f:
+                entries = json.load(f, object_hook=_decode)
+        except FileNotFoundError:
+            return {}, {}
+        except Exception as e:
+            logger.error(f"Error loading snapshot from {self.path}: {str(e)}")
+            return {}, {}
+
+        values, fetched_at = {}, {}
+        for name, entry in entries.items():
+            if now - entry["fetched_at"] <= self.max_age:
+                values[name] = entry["value"]
+                fetched_at[name] = entry["fetched_at"]
+        return values, fetched_at
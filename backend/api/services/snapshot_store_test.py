@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).resolve().parents[3]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.api.services.departures import Departure, DepartureTable
+from backend.api.services.snapshot_store import SnapshotStore
+
+
+def test_round_trip_keeps_only_fresh_entries(tmp_path):
+    store = SnapshotStore(tmp_path / "snapshot.json", max_age=600)
+    table = DepartureTable.from_departures([
+        Departure("16", "St. Emmeram", 1000, is_live=True, delay=60),
+        Departure("16", "Romanplatz", 400, is_live=False),
+    ])
+    values = {
+        "trams:default": {"northbound": table},
+        "weather": {"current": {"temp": 12}},
+    }
+    store.save(values, {"trams:default": 5000, "weather": 4000})
+
+    restored, fetched_at = store.load(now=5000)
+    assert list(restored) == ["trams:default"]
+    assert fetched_at == {"trams:default": 5000}
+    assert restored["trams:default"]["northbound"].render(0) == table.render(0)
+
+
+def test_missing_file_restores_nothing(tmp_path):
+    assert SnapshotStore(tmp_path / "absent.json").load() == ({}, {})
@@ -0,0 +1,359 @@
+"""Compiled timetable for scheduled departures.
+
+Schedules are loaded from a timetable file (YAML or JSON) and compiled into
+one sorted ``array('i')`` of departure seconds per station, line, destination
+and service calendar. Finding the next scheduled departures after a moment
+is a binary search per active calendar.
+
+A GTFS feed can be compiled offline into the same file format, keeping only
+the stations named in the board configuration::
+
+    python -m backend.api.services.timetable_service <gtfs_dir> <output.json>
+"""
+import csv
+import json
+import os
+import sys
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import yaml
+
+DEFAULT_TIMETABLE_PATH = Path(__file__).parent.parent.parent / "config" / "timetable.yaml"
+
+# GTFS route types and the MVG transport type names they correspond to
+GTFS_ROUTE_TYPES = {0: "Tram", 1: "U-Bahn", 2: "S-Bahn", 3: "Bus", 4: "Schiff"}
+
+Calendar = namedtuple("Calendar", ["days", "start", "end", "added", "removed", "holidays"])
+Pattern = namedtuple("Pattern", ["station", "line", "type", "destination", "calendar"])
+
+
+def _parse_date(value):
+    if isinstance(value, date):
+        return value
+    value = str(value)
+    if len(value) == 8 and value.isdigit():  # GTFS YYYYMMDD
+        return date(int(value[:4]), int(value[4:6]), int(value[6:]))
+    return date.fromisoformat(value)
+
+
+def _parse_seconds(value):
+    """Seconds after midnight from ``HH:MM[:SS]`` (may exceed 24h) or an int."""
+    if isinstance(value, int):
+        return value
+    parts = [int(part) for part in str(value).split(":")]
+    hours, minutes = parts[0], parts[1]
+    seconds = parts[2] if len(parts) > 2 else 0
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _easter(year):
+    """Easter Sunday (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def bavarian_holidays(year):
+    """Public holidays in Munich (Bavaria, including Assumption Day)."""
+    easter = _easter(year)
+    return {
+        date(year, 1, 1), date(year, 1, 6), date(year, 5, 1),
+        date(year, 8, 15), date(year, 10, 3), date(year, 11, 1),
+        date(year, 12, 25), date(year, 12, 26),
+        easter - timedelta(days=2), easter + timedelta(days=1),
+        easter + timedelta(days=39), easter + timedelta(days=50),
+        easter + timedelta(days=60),
+    }
+
+
+HOLIDAY_REGIONS = {"BY": bavarian_holidays}
+
+
+class Timetable:
+    """Scheduled departures indexed for binary search."""
+
+    def __init__(self, timezone="Europe/Berlin", calendars=None,
+                 holiday_region=None, holiday_dates=()):
+        self.tz = ZoneInfo(timezone)
+        self.calendars = calendars or {}
+        self.holiday_region = holiday_region
+        self.holiday_dates = frozenset(holiday_dates)
+        self._times = {}
+        self._by_station = {}
+        self._active = {}
+
+    def add(self, station, line, dep_type, destination, calendar, seconds):
+        """Add departures (seconds after the service day's midnight)."""
+        if calendar not in self.calendars:
+            raise ValueError(f"Unknown calendar: {calendar}")
+        pattern = Pattern(station, str(line), dep_type, destination, calendar)
+        times = self._times.get(pattern)
+        if times is None:
+            times = self._times[pattern] = array("i")
+            self._by_station.setdefault(station, []).append(pattern)
+        times.extend(seconds)
+
+    def freeze(self):
+        """Sort and de-duplicate every departure array."""
+        for pattern, times in self._times.items():
+            self._times[pattern] = array("i", sorted(set(times)))
+        return self
+
+    def is_holiday(self, day):
+        if day in self.holiday_dates:
+            return True
+        region = HOLIDAY_REGIONS.get(self.holiday_region)
+        return region is not None and day in region(day.year)
+
+    def active_calendars(self, day):
+        """Names of the service calendars running on ``day`` (memoised)."""
+        active = self._active.get(day)
+        if active is None:
+            holiday = self.is_holiday(day)
+            active = frozenset(
+                name for name, calendar in self.calendars.items()
+                if self._runs(calendar, day, holiday)
+            )
+            if len(self._active) > 64:
+                self._active.clear()
+            self._active[day] = active
+        return active
+
+    @staticmethod
+    def _runs(calendar, day, holiday):
+        if day in calendar.removed:
+            return False
+        if day in calendar.added:
+            return True
+        if calendar.start and day < calendar.start:
+            return False
+        if calendar.end and day > calendar.end:
+            return False
+        if holiday:
+            return calendar.holidays
+        return day.weekday() in calendar.days
+
+    def patterns(self, station):
+        """Departure patterns served at a station."""
+        return self._by_station.get(station, ())
+
+    def next_departures(self, patterns, after, limit=10, horizon=86400):
+        """Next scheduled departures strictly after ``after`` (a unix timestamp).
+
+        Returns up to ``limit`` ``(timestamp, pattern)`` pairs within
+        ``horizon`` seconds, sorted by time.
+        """
+        until = after + horizon
+        start_day = datetime.fromtimestamp(after, self.tz).date()
+        results = []
+
+        # Yesterday's service day may still run past midnight
+        day = start_day - timedelta(days=1)
+        while True:
+            # As in GTFS, service times count from noon minus 12h, which keeps
+            # them on the wall clock on days the clocks change
+            noon = datetime.combine(day, time(12), self.tz)
+            midnight = int(noon.timestamp()) - 12 * 3600
+            if midnight > until:
+                break
+            active = self.active_calendars(day)
+            for pattern in patterns:
+                if pattern.calendar not in active:
+                    continue
+                times = self._times[pattern]
+                index = bisect_right(times, after - midnight)
+                for seconds in times[index:index + limit]:
+                    timestamp = midnight + seconds
+                    if timestamp > until:
+                        break
+                    results.append((timestamp, pattern))
+            day += timedelta(days=1)
+
+        results.sort(key=lambda item: item[0])
+        return results[:limit]
+
+
+def _compile_calendar(raw):
+    return Calendar(
+        days=frozenset(raw.get("days", ())),
+        start=_parse_date(raw["start"]) if raw.get("start") else None,
+        end=_parse_date(raw["end"]) if raw.get("end") else None,
+        added=frozenset(_parse_date(d) for d in raw.get("added", ())),
+        removed=frozenset(_parse_date(d) for d in raw.get("removed", ())),
+        holidays=bool(raw.get("holidays", False))
+    )
+
+
+def compile_timetable(raw):
+    """Compile a parsed timetable file into a Timetable."""
+    holidays = raw.get("holidays") or {}
+    timetable = Timetable(
+        timezone=raw.get("timezone", "Europe/Berlin"),
+        calendars={
+            name: _compile_calendar(calendar or {})
+            for name, calendar in (raw.get("calendars") or {}).items()
+        },
+        holiday_region=holidays.get("region"),
+        holiday_dates=[_parse_date(d) for d in holidays.get("dates", ())]
+    )
+
+    for service in raw.get("services") or ():
+        if "every" in service:
+            every = service["every"]
+            seconds = range(
+                _parse_seconds(every["first"]),
+                _parse_seconds(every["last"]) + 1,
+                int(every["minutes"]) * 60
+            )
+        else:
+            seconds = [_parse_seconds(value) for value in service["times"]]
+        timetable.add(
+            station=service["station"],
+            line=service["line"],
+            dep_type=service.get("type"),
+            destination=service.get("destination", ""),
+            calendar=service["calendar"],
+            seconds=seconds
+        )
+
+    return timetable.freeze()
+
+
+def load_timetable(path=None):
+    """Load and compile the timetable file; an empty timetable if it is missing."""
+    path = Path(path or os.getenv("MVG_TIMETABLE", DEFAULT_TIMETABLE_PATH))
+    if not path.exists():
+        return Timetable().freeze()
+    with open(path, encoding="utf-8") as f:
+        return compile_timetable(yaml.safe_load(f) or {})
+
+
+def compile_gtfs(gtfs_dir, stations, timezone="Europe/Berlin"):
+    """Compile a GTFS feed into the timetable file format.
+
+    ``stations`` maps configured station keys to their global station ids;
+    stop times at any other stop are skipped while streaming, so only the
+    configured stations end up in the output.
+    """
+    gtfs_dir = Path(gtfs_dir)
+
+    def rows(name):
+        path = gtfs_dir / name
+        if not path.exists():
+            return
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            yield from csv.DictReader(f)
+
+    # GTFS stop ids are often platform-level ("de:09162:600:2:3"), so a stop
+    # belongs to a station when its id starts with one of the station's ids
+    station_ids = {
+        stop_id: key for key, stop_ids in stations.items() for stop_id in stop_ids
+    }
+    stop_to_station = {}
+
+    def station_for(stop_id):
+        if stop_id not in stop_to_station:
+            parts = stop_id.split(":")
+            stop_to_station[stop_id] = next(
+                (
+                    station_ids[prefix]
+                    for prefix in (":".join(parts[:n]) for n in range(len(parts), 0, -1))
+                    if prefix in station_ids
+                ),
+                None
+            )
+        return stop_to_station[stop_id]
+
+    calendars = {}
+    for row in rows("calendar.txt"):
+        calendars[row["service_id"]] = {
+            "days": [
+                index for index, name in enumerate(
+                    ["monday", "tuesday", "wednesday", "thursday",
+                     "friday", "saturday", "sunday"]
+                )
+                if row[name] == "1"
+            ],
+            "start": row["start_date"],
+            "end": row["end_date"],
+            "added": [],
+            "removed": []
+        }
+    for row in rows("calendar_dates.txt"):
+        calendar = calendars.setdefault(
+            row["service_id"], {"days": [], "added": [], "removed": []}
+        )
+        key = "added" if row["exception_type"] == "1" else "removed"
+        calendar[key].append(row["date"])
+
+    routes = {
+        row["route_id"]: (
+            row.get("route_short_name") or row.get("route_long_name", ""),
+            GTFS_ROUTE_TYPES.get(int(row.get("route_type") or 3), "Bus")
+        )
+        for row in rows("routes.txt")
+    }
+    trips = {
+        row["trip_id"]: (row["route_id"], row["service_id"], row.get("trip_headsign", ""))
+        for row in rows("trips.txt")
+    }
+
+    services = {}
+    for row in rows("stop_times.txt"):
+        station = station_for(row["stop_id"])
+        if station is None or not row.get("departure_time"):
+            continue
+        route_id, service_id, headsign = trips[row["trip_id"]]
+        line, dep_type = routes[route_id]
+        destination = row.get("stop_headsign") or headsign
+        key = (station, line, dep_type, destination, service_id)
+        services.setdefault(key, []).append(_parse_seconds(row["departure_time"]))
+
+    return {
+        "timezone": timezone,
+        "calendars": calendars,
+        "services": [
+            {
+                "station": station,
+                "line": line,
+                "type": dep_type,
+                "destination": destination,
+                "calendar": service_id,
+                "times": sorted(times)
+            }
+            for (station, line, dep_type, destination, service_id), times
+            in sorted(services.items())
+        ]
+    }
+
+
+timetable = load_timetable()
+
+
+if __name__ == "__main__":
+    from backend.api.services.config_service import config
+
+    if len(sys.argv) != 3:
+        print("Usage: python -m backend.api.services.timetable_service <gtfs_dir> <output.json>")
+        sys.exit(1)
+
+    compiled = compile_gtfs(
+        sys.argv[1],
+        {key: station.ids for key, station in config.stations.items()}
+    )
+    with open(sys.argv[2], "w", encoding="utf-8") as f:
+        json.dump(compiled, f, ensure_ascii=False)
+    print(f"Wrote {len(compiled['services'])} departure patterns to {sys.argv[2]}")
@@ -0,0 +1,93 @@
+import sys
+from datetime import date, datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).resolve().parents[3]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.api.services.timetable_service import (
+    bavarian_holidays, compile_gtfs, compile_timetable
+)
+
+BERLIN = ZoneInfo("Europe/Berlin")
+
+TIMETABLE = {
+    "timezone": "Europe/Berlin",
+    "holidays": {"region": "BY"},
+    "calendars": {
+        "weekday": {"days": [0, 1, 2, 3, 4]},
+        "sunday": {"days": [6], "holidays": True},
+    },
+    "services": [
+        {"station": "st_emmeram", "line": "189", "type": "Bus",
+         "destination": "Unterföhring", "calendar": "weekday",
+         "every": {"first": "06:08", "last": "20:28", "minutes": 20}},
+        {"station": "st_emmeram", "line": "189", "type": "Bus",
+         "destination": "Unterföhring", "calendar": "sunday",
+         "times": ["09:00", "24:30"]},
+    ],
+}
+
+
+def _ts(*args):
+    return int(datetime(*args, tzinfo=BERLIN).timestamp())
+
+
+def _next(timetable, after, limit=3):
+    patterns = timetable.patterns("st_emmeram")
+    departures = timetable.next_departures(patterns, after, limit=limit, horizon=2 * 86400)
+    return [ts for ts, _ in departures]
+
+
+def test_next_departures_on_a_weekday():
+    timetable = compile_timetable(TIMETABLE)
+    # Wednesday 2026-10-14, just after the 07:08 bus
+    result = _next(timetable, _ts(2026, 10, 14, 7, 8))
+    assert result == [_ts(2026, 10, 14, 7, 28), _ts(2026, 10, 14, 7, 48), _ts(2026, 10, 14, 8, 8)]
+
+
+def test_holidays_run_the_sunday_calendar():
+    timetable = compile_timetable(TIMETABLE)
+    assert date(2026, 10, 3) in bavarian_holidays(2026)
+    assert date(2026, 4, 6) in bavarian_holidays(2026)  # Easter Monday
+    # Easter Monday: no weekday service, Sunday service including after midnight
+    result = _next(timetable, _ts(2026, 4, 6, 5, 0))
+    assert result == [_ts(2026, 4, 6, 9, 0), _ts(2026, 4, 7, 0, 30), _ts(2026, 4, 7, 6, 8)]
+
+
+def test_departures_keep_their_wall_clock_time_when_the_clocks_change():
+    timetable = compile_timetable(TIMETABLE)
+    # Summer time starts on Sunday 2026-03-29 at 02:00
+    result = _next(timetable, _ts(2026, 3, 29, 5, 0))
+    assert result == [_ts(2026, 3, 29, 9, 0), _ts(2026, 3, 30, 0, 30), _ts(2026, 3, 30, 6, 8)]
+    assert datetime.fromtimestamp(result[0], BERLIN).utcoffset().seconds == 2 * 3600
+    # And ends on Sunday 2026-10-25 at 03:00
+    result = _next(timetable, _ts(2026, 10, 25, 5, 0))
+    assert result == [_ts(2026, 10, 25, 9, 0), _ts(2026, 10, 26, 0, 30), _ts(2026, 10, 26, 6, 8)]
+
+
+def test_compile_gtfs_keeps_configured_stations(tmp_path):
+    files = {
+        "calendar.txt": "service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,start_date,end_date\n"
+                        "wk,1,1,1,1,1,0,0,20260101,20261231\n",
+        "calendar_dates.txt": "service_id,date,exception_type\nwk,20261014,2\n",
+        "routes.txt": "route_id,route_short_name,route_type\nr189,189,3\n",
+        "trips.txt": "route_id,service_id,trip_id,trip_headsign\nr189,wk,t1,Unterföhring\n",
+        "stop_times.txt": "trip_id,stop_id,departure_time\n"
+                          "t1,de:09162:600:2:3,06:08:00\nt1,de:09162:999,06:20:00\n",
+    }
+    for name, content in files.items():
+        (tmp_path / name).write_text(content, encoding="utf-8")
+
+    compiled = compile_gtfs(tmp_path, {"st_emmeram": ["de:09162:600"]})
+    assert compiled["services"] == [{
+        "station": "st_emmeram", "line": "189", "type": "Bus",
+        "destination": "Unterföhring", "calendar": "wk", "times": [6 * 3600 + 8 * 60],
+    }]
+
+    timetable = compile_timetable(compiled)
+    # Removed on 2026-10-14, runs again the next day
+    assert _next(timetable, _ts(2026, 10, 14, 0, 0), limit=1) == [_ts(2026, 10, 15, 6, 8)]
@@ -1,93 +1,112 @@
-from mvg import MvgApi
 from datetime import datetime
+from functools import partial
 
-STATION_IDS = [
-    {"name": "Prinz-Eugen-Park", "id": "de:09774:2856"},
-    {"name": "Prinz-Eugen-Park", "id": "de:09162:632"}
-]
+from backend.api.services.cache import CacheEntry, SingleFlight
+from backend.api.services.config_service import config
+from backend.api.services.delay_service import delay_history
+from backend.api.services.departures import Departure, DepartureTable
+from backend.api.services.fetch_service import fetch_departures
+from backend.api.services.metrics import cache_requests
+from backend.api.services.resilience import LatencyBudget
 
-def get_tram_departures():
-    """Get tram departures sorted by direction"""
+# Seconds a tram refresh may spend waiting on MVG
+REFRESH_BUDGET = 6
+# Seconds fetched departures are served before MVG is asked again
+CACHE_SECONDS = 180
+
+# Latest departures per board; entries are replaced, never modified
+_cache = {}
+_flight = SingleFlight()
+
+def _fetch_tram_departures(board, current_timestamp):
+    """Query MVG for the board's trams; returns None when every station failed."""
+    tram_filter = board.trams
+    by_direction = {direction: [] for direction in tram_filter.direction_names}
+
+    # Query all stations concurrently
+    results = fetch_departures(
+        tram_filter.station_ids, budget=LatencyBudget(REFRESH_BUDGET)
+    )
+
+    failed = 0
+    for station_id, departures in results.items():
+        if isinstance(departures, BaseException):
+            print(f"Error fetching tram data for {station_id}: {str(departures)}")
+            failed += 1
+            continue
+
+        for dep in departures:
+            direction = tram_filter.classify(dep)
+            if direction is None:
+                continue
+
+            planned_time = dep.get("planned", 0)
+            actual_time = dep.get("time", planned_time)
+            delay_history.observe(
+                dep.get("line"), tram_filter.station.key, planned_time, actual_time
+            )
+
+            if actual_time >= current_timestamp:
+                by_direction[direction].append(Departure(
+                    line=dep.get("line", "Unknown"),
+                    destination=dep.get("destination", "Unknown"),
+                    timestamp=actual_time,
+                    delay=actual_time - planned_time if planned_time else 0,
+                    is_live=True
+                ))
+
+    delay_history.settle()
+
+    # Only update cache if MVG answered; no trams at night is an answer too
+    if failed == len(results):
+        return None
+    tables = {
+        direction: DepartureTable.from_departures(
+            sorted(trams, key=lambda x: x.timestamp)[:tram_filter.limit]
+        )
+        for direction, trams in by_direction.items()
+    }
+    # Publish the tables and their fetch time together
+    _cache[board.name] = CacheEntry(tables, current_timestamp)
+    return tables
+
+def get_tram_departures(board_name=None, max_age=CACHE_SECONDS):
+    """Get tram departures sorted by direction.
+
+    Returns one DepartureTable per direction; callers render relative
+    minutes from it when they need them. Departures fetched less than
+    ``max_age`` seconds ago are reused. Concurrent callers that find the
+    cache expired share a single MVG fetch.
+
+    Returns None when MVG could not be reached, so callers keep serving
+    their last good departures.
+    """
+    board = config.get_board(board_name)
     try:
         current_timestamp = datetime.now().timestamp()
-        
-        # Get cached data and last fetch time
-        static_departures = getattr(get_tram_departures, '_cached_departures', None)
-        last_fetch_time = getattr(get_tram_departures, '_last_fetch_time', 0)
-        
-        # Only fetch new data every 180 seconds (3 minutes)
-        if not static_departures or (current_timestamp - last_fetch_time) >= 180:
-            try:
-                northbound = []
-                southbound = []
-                
-                for station in STATION_IDS:
-                    mvg = MvgApi(station["id"])
-                    departures = mvg.departures()
-                    
-                    for dep in departures:
-                        if dep.get("type") == "Tram":  # Matches actual API response
-                            planned_time = dep.get("planned", 0)
-                            actual_time = dep.get("time", planned_time)
-                            minutes = int((actual_time - current_timestamp) // 60)
-                            
-                            if minutes >= 0:
-                                tram_info = {
-                                    "line": dep.get("line", "Unknown"),
-                                    "destination": dep.get("destination", "Unknown"),
-                                    "minutes": minutes,
-                                    "timestamp": actual_time,
-                                    "delay": actual_time - planned_time if planned_time else 0,
-                                    "is_live": True
-                                }
-                                
-                                if "st. emmeram" in dep.get("destination", "").lower():
-                                    northbound.append(tram_info)
-                                else:
-                                    southbound.append(tram_info)
-                
-                # Only update cache if we successfully got new data
-                if northbound or southbound:
-                    northbound.sort(key=lambda x: x["minutes"])
-                    southbound.sort(key=lambda x: x["minutes"])
-                    
-                    get_tram_departures._cached_departures = {
-                        "northbound": northbound[:4],
-                        "southbound": southbound[:4]
-                    }
-                    get_tram_departures._last_fetch_time = current_timestamp
-                    return get_tram_departures._cached_departures
-                elif static_departures:
-                    # If no new data but we have cache, keep using it
-                    return static_departures
-                
-            except Exception as e:
-                print(f"Error fetching new tram data: {str(e)}")
-                if static_departures:
-                    return static_departures
-                return {"northbound": [], "southbound": []}
-        
-        # Update minutes in cached data
-        if static_departures:
-            result = {
-                "northbound": [],
-                "southbound": []
-            }
-            
-            for direction in ['northbound', 'southbound']:
-                result[direction] = [
-                    {**dep, 'minutes': int((dep['timestamp'] - current_timestamp) // 60)}
-                    for dep in static_departures[direction]
-                    if int((dep['timestamp'] - current_timestamp) // 60) >= 0
-                ]
-            
-            return result
-            
-        return {"northbound": [], "southbound": []}
-        
+
+        # Get cached data and last fetch time for this board
+        entry = _cache.get(board.name)
+        static_departures = entry.value if entry else None
+        last_fetch_time = entry.fetched_at if entry else 0
+
+        # Only fetch new data every max_age seconds (3 minutes by default)
+        if static_departures and (current_timestamp - last_fetch_time) < max_age:
+            cache_requests.inc(cache="trams", result="hit")
+            return static_departures
+        cache_requests.inc(cache="trams", result="miss")
+
+        try:
+            tables = _flight.do(
+                board.name, partial(_fetch_tram_departures, board, current_timestamp)
+            )
+            if tables is not None:
+                return tables
+
+        except Exception as e:
+            print(f"Error fetching new tram data: {str(e)}")
+        return None
+
     except Exception as e:
         print(f"Error in get_tram_departures: {str(e)}")
-        return {
-            "northbound": [],
-            "southbound": []
-        }
+        return None
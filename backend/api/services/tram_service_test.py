@@ -0,0 +1,30 @@
+import sys
+import threading
+from pathlib import Path
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).resolve().parents[3]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.api.services import tram_service
+from backend.replay.upstream import ReplayUpstream
+
+
+def test_concurrent_misses_share_one_fetch():
+    tram_service._cache.clear()
+    results = []
+    with ReplayUpstream(latency=0.2) as upstream:
+        threads = [
+            threading.Thread(target=lambda: results.append(tram_service.get_tram_departures()))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    # One query per configured station, not one per caller
+    assert upstream.calls["mvg"] == 2
+    assert all(result is results[0] for result in results)
+    assert len(results[0]["northbound"]) > 0
@@ -2,12 +2,89 @@ import requests
 from datetime import datetime, timedelta
 import logging
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
+from backend.api.services.cache import SingleFlight
+from backend.api.services.http_clients import OPENWEATHER_TIMEOUT, http_session
+from backend.api.services.metrics import cache_requests, upstream_seconds
+from backend.api.services.quota import get_quota
+from backend.api.services.resilience import (
+    CircuitOpenError, LatencyBudget, QuotaExceededError, get_breaker
+)
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+FORECAST_URL = "https://api.openweathermap.org/data/2.5/forecast"
+# 3-hour slots: the 6-hour outlook, min/max included, needs two
+FORECAST_SLOTS = 2
+BREAKER_NAME = "openweather"
+# Seconds a weather refresh may spend waiting on OpenWeather
+REQUEST_BUDGET = 5
+
+# German descriptions by OpenWeather condition code, so a single English
+# request covers both languages
+DESCRIPTIONS_DE = {
+    200: "Gewitter mit leichtem Regen",
+    201: "Gewitter mit Regen",
+    202: "Gewitter mit Starkregen",
+    210: "Leichtes Gewitter",
+    211: "Gewitter",
+    212: "Schweres Gewitter",
+    221: "Vereinzelte Gewitter",
+    230: "Gewitter mit leichtem Nieselregen",
+    231: "Gewitter mit Nieselregen",
+    232: "Gewitter mit starkem Nieselregen",
+    300: "Leichter Nieselregen",
+    301: "Nieselregen",
+    302: "Starker Nieselregen",
+    310: "Leichter Nieselregen mit Regen",
+    311: "Nieselregen mit Regen",
+    312: "Starker Nieselregen mit Regen",
+    313: "Regenschauer und Nieselregen",
+    314: "Starke Regenschauer und Nieselregen",
+    321: "Nieselschauer",
+    500: "Leichter Regen",
+    501: "Mäßiger Regen",
+    502: "Starker Regen",
+    503: "Sehr starker Regen",
+    504: "Extremer Regen",
+    511: "Gefrierender Regen",
+    520: "Leichte Regenschauer",
+    521: "Regenschauer",
+    522: "Starke Regenschauer",
+    531: "Vereinzelte Regenschauer",
+    600: "Leichter Schneefall",
+    601: "Schneefall",
+    602: "Starker Schneefall",
+    611: "Schneeregen",
+    612: "Leichte Schneeregenschauer",
+    613: "Schneeregenschauer",
+    615: "Leichter Regen und Schnee",
+    616: "Regen und Schnee",
+    620: "Leichte Schneeschauer",
+    621: "Schneeschauer",
+    622: "Starke Schneeschauer",
+    701: "Trüb",
+    711: "Rauch",
+    721: "Dunst",
+    731: "Sand- und Staubwirbel",
+    741: "Nebel",
+    751: "Sand",
+    761: "Staub",
+    762: "Vulkanasche",
+    771: "Sturmböen",
+    781: "Tornado",
+    800: "Klarer Himmel",
+    801: "Ein paar Wolken",
+    802: "Mäßig bewölkt",
+    803: "Überwiegend bewölkt",
+    804: "Bedeckt",
+}
+
 class WeatherService:
     def __init__(self):
         self.API_KEY = os.getenv('OPENWEATHER_API_KEY', "535155cbe44494b5bb60c08cfe379f60")
@@ -15,133 +92,170 @@ class WeatherService:
         self.LON = "11.63320"
         self.cache = None
         self.cache_time = None
+        self.forecast = None
+        self.forecast_time = None
         self.CACHE_DURATION = timedelta(minutes=15)
+        self.breaker = get_breaker(BREAKER_NAME)
+        self.quota = get_quota(BREAKER_NAME)
+        # Concurrent misses share one OpenWeather request; the lock keeps
+        # each value published together with its timestamp
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+
+    def _cache_duration(self):
+        # Cached values are kept longer as the daily call budget runs low
+        return self.CACHE_DURATION * self.quota.stretch()
 
     def _is_cache_valid(self):
-        if not self.cache or not self.cache_time:
+        with self._lock:
+            cache, cache_time = self.cache, self.cache_time
+        if not cache or not cache_time:
             return False
-        return datetime.now() - self.cache_time < self.CACHE_DURATION
+        return datetime.now() - cache_time < self._cache_duration()
 
-    def _get_daily_minmax(self):
-        """Get forecast min/max temperatures for the next 12 hours"""
+    def _is_forecast_valid(self):
+        with self._lock:
+            forecast, forecast_time = self.forecast, self.forecast_time
+        if not forecast or not forecast_time:
+            return False
+        return datetime.now() - forecast_time < self._cache_duration()
+
+    def _get_forecast(self):
+        """Return the raw forecast payload, fetching it at most once per interval"""
+        if self._is_forecast_valid():
+            return self.forecast
+        return self._flight.do("forecast", self._fetch_forecast)
+
+    def _fetch_forecast(self):
+        params = {
+            "lat": self.LAT,
+            "lon": self.LON,
+            "appid": self.API_KEY,
+            "units": "metric",
+            "cnt": FORECAST_SLOTS
+        }
+
+        budget = LatencyBudget(REQUEST_BUDGET)
+        # Only takes a call from the budget when the breaker lets it through
+        self.breaker.before_call(self.quota)
         try:
-            url = "https://api.openweathermap.org/data/2.5/forecast"
-            params = {
-                "lat": self.LAT,
-                "lon": self.LON,
-                "appid": self.API_KEY,
-                "units": "metric"
-            }
-            
-            response = requests.get(url, params=params, timeout=5)
+            forecast = self._request_forecast(
+                params, timeout=budget.timeout(OPENWEATHER_TIMEOUT)
+            )
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        with self._lock:
+            self.forecast = forecast
+            self.forecast_time = datetime.now()
+        return forecast
+
+    @staticmethod
+    def _request_forecast(params, timeout):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = http_session("openweather").get(
+                FORECAST_URL, params=params, timeout=timeout
+            )
             response.raise_for_status()
-            forecast_data = response.json()
-            
-            now = datetime.now()
-            forecast_window = now + timedelta(hours=12)
+            forecast = response.json()
+            outcome = "ok"
+            return forecast
+        finally:
+            upstream_seconds.observe(
+                time.perf_counter() - start, upstream="openweather", outcome=outcome
+            )
+
+    def get_weather(self, fallback=True):
+        """Get weather forecast for the next 6 hours
+
+        Errors are answered with cached or placeholder data, or raised when
+        ``fallback`` is False, so a caller can keep its last good value.
+        """
+        if self._is_cache_valid():
+            cache_requests.inc(cache="weather", result="hit")
+            return self.cache
+        try:
+            return self._flight.do("weather", self._load_weather)
+        except Exception as e:
+            if not fallback:
+                raise
+            return self._fallback_for(e)
+
+    def _load_weather(self):
+        cache_requests.inc(cache="weather", result="miss")
+        forecast = self._get_forecast()
+
+        # Process forecast data
+        forecasts = forecast['list'][:2]  # Next 6 hours (2 time slots)
+        
+        if forecasts:
+            # Find most relevant conditions
+            max_pop = max(f['pop'] for f in forecasts)  # Highest rain probability
+            min_feels_like = min(f['main']['feels_like'] for f in forecasts)
+            max_wind = max(f['wind']['speed'] for f in forecasts)
             
-            relevant_forecasts = [
-                item for item in forecast_data['list']
-                if now.timestamp() <= item['dt'] <= forecast_window.timestamp()
-            ]
+            # Get the forecast with highest rain probability
+            worst_forecast = max(forecasts, key=lambda x: x['pop'])
             
-            if relevant_forecasts:
-                temps = [item['main']['temp'] for item in relevant_forecasts]
-                return round(min(temps)), round(max(temps))
+            # Get all "feels like" temperatures for the forecast period
+            feels_like_temps = [f['main']['feels_like'] for f in forecasts]
             
-            return None, None
-                
-        except Exception as e:
-            logger.error(f"Error fetching forecast: {str(e)}")
-            return None, None
-
-    def get_weather(self):
-        """Get weather forecast for the next 6 hours"""
-        try:
-            if self._is_cache_valid():
-                return self.cache
-
-            # Fetch forecast data
-            url = "https://api.openweathermap.org/data/2.5/forecast"
-            params = {
-                "lat": self.LAT,
-                "lon": self.LON,
-                "appid": self.API_KEY,
-                "units": "metric",
-                "cnt": 3  # Limit to next 3 time slots (9 hours)
+            processed_data = {
+                "temp": round(feels_like_temps[0]),                # Current feels like
+                "temp_min": round(min(feels_like_temps)),         # Min feels like
+                "temp_max": round(max(feels_like_temps)),         # Max feels like
+                "humidity": worst_forecast['main']['humidity'],
+                "wind_speed": round(max_wind * 3.6, 1),          # m/s to km/h
+                "condition": worst_forecast['weather'][0]['main'].lower(),
+                "description_en": worst_forecast['weather'][0]['description'],
+                "description_de": DESCRIPTIONS_DE.get(
+                    worst_forecast['weather'][0]['id'],
+                    worst_forecast['weather'][0]['description']
+                ),
+                "icon": worst_forecast['weather'][0]['icon'],
+                "rain_chance": round(max_pop * 100),             # Convert to percentage
+                "forecast_time": worst_forecast['dt']
             }
 
-            # Get forecast in both languages
-            response_en = requests.get(url, params=dict(params, lang="en"), timeout=5)
-            response_en.raise_for_status()
-            forecast_en = response_en.json()
+            # Add rain/snow volume if present
+            if 'rain' in worst_forecast:
+                processed_data['rain_volume'] = worst_forecast['rain'].get('3h', 0)
+            if 'snow' in worst_forecast:
+                processed_data['snow_volume'] = worst_forecast['snow'].get('3h', 0)
 
-            response_de = requests.get(url, params=dict(params, lang="de"), timeout=5)
-            response_de.raise_for_status()
-            forecast_de = response_de.json()
-
-            # Process forecast data
-            forecasts = forecast_en['list'][:2]  # Next 6 hours (2 time slots)
-            
-            if forecasts:
-                # Find most relevant conditions
-                max_pop = max(f['pop'] for f in forecasts)  # Highest rain probability
-                min_feels_like = min(f['main']['feels_like'] for f in forecasts)
-                max_wind = max(f['wind']['speed'] for f in forecasts)
-                
-                # Get the forecast with highest rain probability
-                worst_forecast = max(forecasts, key=lambda x: x['pop'])
-                
-                # Find matching German description
-                de_forecast = next(
-                    f for f in forecast_de['list'] 
-                    if f['dt'] == worst_forecast['dt']
-                )
-
-                # Get all "feels like" temperatures for the forecast period
-                feels_like_temps = [f['main']['feels_like'] for f in forecasts]
-                
-                processed_data = {
-                    "temp": round(feels_like_temps[0]),                # Current feels like
-                    "temp_min": round(min(feels_like_temps)),         # Min feels like
-                    "temp_max": round(max(feels_like_temps)),         # Max feels like
-                    "humidity": worst_forecast['main']['humidity'],
-                    "wind_speed": round(max_wind * 3.6, 1),          # m/s to km/h
-                    "condition": worst_forecast['weather'][0]['main'].lower(),
-                    "description_en": worst_forecast['weather'][0]['description'],
-                    "description_de": de_forecast['weather'][0]['description'],
-                    "icon": worst_forecast['weather'][0]['icon'],
-                    "rain_chance": round(max_pop * 100),             # Convert to percentage
-                    "forecast_time": worst_forecast['dt']
-                }
-
-                # Add rain/snow volume if present
-                if 'rain' in worst_forecast:
-                    processed_data['rain_volume'] = worst_forecast['rain'].get('3h', 0)
-                if 'snow' in worst_forecast:
-                    processed_data['snow_volume'] = worst_forecast['snow'].get('3h', 0)
-
-                # Update cache
+            # Update cache
+            with self._lock:
                 self.cache = processed_data
                 self.cache_time = datetime.now()
 
-                return processed_data
+            return processed_data
 
-        except requests.Timeout:
+        raise ValueError("Empty forecast")
+
+    def _fallback_for(self, error):
+        if isinstance(error, QuotaExceededError):
+            logger.warning("OpenWeather call budget used up, serving cached weather")
+            return self.get_fallback_data("Quota exceeded")
+        if isinstance(error, CircuitOpenError):
+            # OpenWeather keeps failing; answer from cache without waiting
+            return self.get_fallback_data("API unavailable")
+        if isinstance(error, requests.Timeout):
             logger.error("Weather API timeout")
-            return self._get_fallback_data("API timeout")
-        except requests.RequestException as e:
-            logger.error(f"Weather API error: {str(e)}")
-            return self._get_fallback_data("API error")
-        except Exception as e:
-            logger.error(f"Unexpected error in weather service: {str(e)}")
-            return self._get_fallback_data("Unknown error")
+            return self.get_fallback_data("API timeout")
+        if isinstance(error, requests.RequestException):
+            logger.error(f"Weather API error: {str(error)}")
+            return self.get_fallback_data("API error")
+        logger.error(f"Unexpected error in weather service: {str(error)}")
+        return self.get_fallback_data("Unknown error")
 
-    def _get_fallback_data(self, error_type):
+    def get_fallback_data(self, error_type):
         """Return cached data if available, otherwise error data"""
         if self.cache:
-            self.cache["error"] = error_type
-            return self.cache
+            cache_requests.inc(cache="weather", result="stale")
+            return {**self.cache, "error": error_type, "stale": True}
         
         return {
             "temp": None,
@@ -0,0 +1,13 @@
+import os
+import shutil
+import tempfile
+
+# Set before the services are imported: keeps snapshots, delay history and
+# call budgets written by the tests out of the real data directory, so runs
+# neither drain the persistent quotas nor depend on earlier runs
+_data_dir = tempfile.mkdtemp(prefix="mvg-test-data-")
+os.environ["MVG_DATA_DIR"] = _data_dir
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_data_dir, ignore_errors=True)
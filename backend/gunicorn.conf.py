@@ -0,0 +1,88 @@
+# Production serving: gunicorn -c backend/gunicorn.conf.py backend.api.main:app
+#
+# One refresher process talks to MVG and OpenWeather and publishes
+# snapshots; the workers only read them, so adding workers adds throughput
+# without adding upstream traffic. The master supervises the refresher and
+# restarts it when it exits or its scheduler stops ticking.
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from backend.api.services.metrics import REFRESHER_HEARTBEAT_PATH
+
+bind = os.getenv("MVG_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("MVG_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+# Every /api/stream client holds one of a worker's threads while connected,
+# so each worker accepts at most MVG_MAX_STREAMS (half its threads by
+# default) and refuses more with 503; those displays poll /api/data instead
+worker_class = "gthread"
+threads = int(os.getenv("MVG_THREADS", 8))
+# Idle streams send a heartbeat every 15 seconds
+timeout = 60
+raw_env = ["MVG_ROLE=reader"]
+
+# The refresher's scheduler touches its heartbeat file every tick; a
+# heartbeat older than this (seconds) means it hangs
+REFRESHER_HEARTBEAT_TIMEOUT = 60
+# Restart delays (seconds), doubled after every quick crash
+RESTART_BACKOFF = 1
+MAX_RESTART_BACKOFF = 60
+
+_refresher = None
+_stopping = threading.Event()
+
+
+def _start_refresher(server):
+    global _refresher
+    _refresher = subprocess.Popen(
+        [sys.executable, "-m", "backend.api.refresher"],
+        env={**os.environ, "MVG_ROLE": "refresher"}
+    )
+    server.log.info(f"Started refresher process {_refresher.pid}")
+    return time.time()
+
+
+def _heartbeat_missed(started_at):
+    try:
+        last_beat = os.stat(REFRESHER_HEARTBEAT_PATH).st_mtime
+    except FileNotFoundError:
+        last_beat = 0
+    return time.time() - max(last_beat, started_at) > REFRESHER_HEARTBEAT_TIMEOUT
+
+
+def _supervise(server):
+    backoff = RESTART_BACKOFF
+    started_at = _start_refresher(server)
+    while not _stopping.wait(1):
+        # poll() also notices an exit the master already reaped
+        if _refresher.poll() is None:
+            if not _heartbeat_missed(started_at):
+                continue
+            server.log.error(f"Refresher {_refresher.pid} stopped responding, restarting it")
+            _refresher.kill()
+            _refresher.wait()
+        else:
+            server.log.error(f"Refresher exited with status {_refresher.returncode}")
+
+        if time.time() - started_at > MAX_RESTART_BACKOFF:
+            backoff = RESTART_BACKOFF
+        if _stopping.wait(backoff):
+            break
+        backoff = min(backoff * 2, MAX_RESTART_BACKOFF)
+        started_at = _start_refresher(server)
+
+
+def on_starting(server):
+    threading.Thread(
+        target=_supervise, args=(server,), name="refresher-supervisor", daemon=True
+    ).start()
+
+
+def on_exit(server):
+    _stopping.set()
+    if _refresher is not None:
+        _refresher.terminate()
+        _refresher.wait(timeout=10)
@@ -0,0 +1,4 @@
+"""Offline stand-ins for the MVG and OpenWeather APIs, and a benchmark on top."""
+from backend.replay.upstream import ReplayUpstream
+
+__all__ = ["ReplayUpstream"]
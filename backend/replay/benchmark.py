@@ -0,0 +1,127 @@
+"""Offline load benchmark for the refresh path and /api/data.
+
+Replays the recorded fixtures instead of calling MVG and OpenWeather, so
+runs are repeatable and need no network:
+
+    python -m backend.replay.benchmark --pollers 50 --requests 200 --latency 0.05
+
+Reports how long a full refresh (fetch, cache, connections, publish)
+takes, then the p50/p99 latency and throughput of /api/data for the given
+number of concurrent pollers.
+"""
+import argparse
+import math
+import threading
+import time
+
+from backend.replay.upstream import ReplayUpstream
+
+
+def percentile(samples, p):
+    """The ``p``-th percentile (0-100) of ``samples``, nearest-rank."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _reset_caches():
+    """Drop every upstream cache so the next refresh fetches again."""
+    from backend.api.services import bus_service, tram_service, weather_service
+
+    tram_service._cache.clear()
+    bus_service._live_cache._entries.clear()
+    weather_service.weather_service.cache_time = None
+    weather_service.weather_service.forecast_time = None
+
+
+def bench_refresh(scheduler, rounds):
+    """Durations (seconds) of ``rounds`` cold refreshes of every source."""
+    durations = []
+    for _ in range(rounds):
+        _reset_caches()
+        start = time.perf_counter()
+        scheduler._refresh_sources(list(scheduler.sources), time.monotonic())
+        scheduler._publish()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def bench_requests(app, pollers, requests_per_poller, path="/api/data"):
+    """Per-request latencies and the wall time of ``pollers`` polling together."""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(pollers + 1)
+
+    def poll():
+        client = app.test_client()
+        own = []
+        barrier.wait()
+        for _ in range(requests_per_poller):
+            start = time.perf_counter()
+            response = client.get(path, headers={"Accept-Encoding": "gzip"})
+            own.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                with lock:
+                    errors.append(response.status_code)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=poll) for _ in range(pollers)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def run(pollers=20, requests_per_poller=100, refreshes=20, latency=0.0,
+        jitter=0.0, error_rate=0.0, seed=0):
+    with ReplayUpstream(latency=latency, jitter=jitter, error_rate=error_rate, seed=seed) as upstream:
+        from backend.api.main import app
+        from backend.api.services.quota import all_quotas
+        from backend.api.services.refresh_service import refresh_scheduler
+
+        # Measure this process only: no restored or persisted snapshots,
+        # and no shared call budgets limiting the replayed upstreams
+        refresh_scheduler.store = None
+        for quota in all_quotas():
+            quota.capacity = None
+
+        refresh = bench_refresh(refresh_scheduler, refreshes)
+        print(f"refresh     rounds={len(refresh)} "
+              f"p50={percentile(refresh, 50) * 1000:.1f}ms "
+              f"p99={percentile(refresh, 99) * 1000:.1f}ms")
+
+        latencies, errors, elapsed = bench_requests(app, pollers, requests_per_poller)
+        print(f"/api/data   pollers={pollers} requests={len(latencies)} "
+              f"p50={percentile(latencies, 50) * 1000:.2f}ms "
+              f"p99={percentile(latencies, 99) * 1000:.2f}ms "
+              f"throughput={len(latencies) / elapsed:.0f} req/s "
+              f"errors={len(errors)}")
+        print(f"upstream    calls={upstream.calls}")
+
+        refresh_scheduler.stop()
+        return {"refresh": refresh, "latencies": latencies, "errors": errors, "elapsed": elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pollers", type=int, default=20, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=100, help="requests per client")
+    parser.add_argument("--refreshes", type=int, default=20, help="cold refresh rounds")
+    parser.add_argument("--latency", type=float, default=0.0, help="upstream latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="upstream failure rate")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.pollers, args.requests, args.refreshes, args.latency,
+        args.jitter, args.error_rate, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Record live MVG departures and an OpenWeather forecast as replay fixtures.
+
+    python -m backend.replay.record [fixtures_dir]
+"""
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+from mvg import MvgApi
+
+from backend.api.services.config_service import config
+from backend.api.services.weather_service import FORECAST_SLOTS, weather_service
+from backend.replay.upstream import FIXTURES_DIR, MVG_FIXTURE, WEATHER_FIXTURE
+
+
+def record(fixtures_dir=FIXTURES_DIR):
+    fixtures_dir = Path(fixtures_dir)
+    fixtures_dir.mkdir(parents=True, exist_ok=True)
+    recorded_at = int(time.time())
+
+    stations = {
+        station_id: asyncio.run(MvgApi.departures_async(station_id))
+        for station_id in config.station_ids()
+    }
+    forecast = weather_service._request_forecast({
+        "lat": weather_service.LAT,
+        "lon": weather_service.LON,
+        "appid": weather_service.API_KEY,
+        "units": "metric",
+        "cnt": FORECAST_SLOTS
+    }, timeout=10)
+
+    with open(fixtures_dir / MVG_FIXTURE, "w") as f:
+        json.dump({"recorded_at": recorded_at, "stations": stations}, f,
+                  ensure_ascii=False, indent=2)
+    with open(fixtures_dir / WEATHER_FIXTURE, "w") as f:
+        json.dump({"recorded_at": recorded_at, "forecast": forecast}, f, indent=2)
+    print(f"Recorded {len(stations)} stations and the forecast to {fixtures_dir}")
+
+
+if __name__ == "__main__":
+    record(*sys.argv[1:])
@@ -0,0 +1,143 @@
+import asyncio
+import copy
+import json
+import random
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+import requests
+from mvg import MvgApi, MvgApiError
+
+from backend.api.services.weather_service import FORECAST_URL
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+MVG_FIXTURE = "mvg_departures.json"
+WEATHER_FIXTURE = "openweather_forecast.json"
+
+# Departure fields holding epoch seconds, shifted to "now" on replay
+_MVG_TIME_FIELDS = ("time", "planned")
+
+
+class _Response:
+    """The parts of requests.Response the weather service uses."""
+
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error", response=self)
+
+
+class ReplayUpstream:
+    """Replays recorded MVG departures and OpenWeather forecasts.
+
+    While installed (``install()`` or ``with ReplayUpstream(...):``),
+    ``MvgApi.departures_async``, ``MvgApi.departures`` and OpenWeather
+    requests are answered from the fixtures, with every timestamp moved
+    forward by the time elapsed since the recording. Each call waits
+    ``latency`` seconds (plus up to ``jitter``) and fails with probability
+    ``error_rate``, so slow and flaky upstreams can be reproduced.
+    """
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR, latency=0.0, jitter=0.0,
+                 error_rate=0.0, seed=None):
+        fixtures_dir = Path(fixtures_dir)
+        with open(fixtures_dir / MVG_FIXTURE) as f:
+            self.mvg = json.load(f)
+        with open(fixtures_dir / WEATHER_FIXTURE) as f:
+            self.weather = json.load(f)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = {"mvg": 0, "openweather": 0}
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._patches = []
+
+    def _delay(self):
+        with self._random_lock:
+            return self.latency + self._random.uniform(0, self.jitter)
+
+    def _fails(self):
+        with self._random_lock:
+            return self._random.random() < self.error_rate
+
+    def departures(self, station_id, limit=10):
+        """Recorded departures for a station, shifted to the current time."""
+        offset = int(time.time()) - self.mvg["recorded_at"]
+        departures = copy.deepcopy(self.mvg["stations"].get(station_id, []))
+        for dep in departures:
+            for field in _MVG_TIME_FIELDS:
+                dep[field] += offset
+        return departures[:limit]
+
+    def forecast(self):
+        """The recorded forecast, shifted to the current time."""
+        offset = int(time.time()) - self.weather["recorded_at"]
+        forecast = copy.deepcopy(self.weather["forecast"])
+        for item in forecast["list"]:
+            item["dt"] += offset
+        return forecast
+
+    async def departures_async(self, station_id, limit=10, offset=0,
+                               transport_types=None, session=None):
+        self.calls["mvg"] += 1
+        await asyncio.sleep(self._delay())
+        if self._fails():
+            raise MvgApiError("Bad API call: injected failure")
+        return self.departures(station_id, limit)
+
+    def session_get(self, session, url, *args, **kwargs):
+        if url != FORECAST_URL:
+            return self._original_session_get(session, url, *args, **kwargs)
+        return self.get(url, *args, **kwargs)
+
+    def get(self, url, *args, **kwargs):
+        if url != FORECAST_URL:
+            return self._original_get(url, *args, **kwargs)
+        self.calls["openweather"] += 1
+        time.sleep(self._delay())
+        if self._fails():
+            raise requests.ConnectionError("Injected failure")
+        return _Response(self.forecast())
+
+    def install(self):
+        replay = self
+
+        def departures(api, limit=10, offset=0, transport_types=None):
+            return asyncio.run(replay.departures_async(api.station_id, limit, offset))
+
+        def session_get(session, url, *args, **kwargs):
+            return replay.session_get(session, url, *args, **kwargs)
+
+        self._original_get = requests.get
+        self._original_session_get = requests.Session.get
+        self._patches = [
+            mock.patch.object(MvgApi, "departures_async", staticmethod(self.departures_async)),
+            mock.patch.object(MvgApi, "departures", departures),
+            # MvgApi() looks the station up online; accept any id as is
+            mock.patch.object(MvgApi, "station", staticmethod(lambda query: {"id": query})),
+            mock.patch.object(requests, "get", self.get),
+            mock.patch.object(requests.Session, "get", session_get),
+        ]
+        for patch in self._patches:
+            patch.start()
+        return self
+
+    def uninstall(self):
+        for patch in reversed(self._patches):
+            patch.stop()
+        self._patches = []
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc_info):
+        self.uninstall()
@@ -0,0 +1,38 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from mvg import MvgApiError
+
+# Add the project root directory to sys.path
+project_root = Path(__file__).resolve().parents[2]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from backend.api.services.fetch_service import fetch_departures
+from backend.api.services.weather_service import WeatherService
+from backend.replay.upstream import ReplayUpstream
+
+
+def test_replays_shifted_fixtures_offline():
+    with ReplayUpstream() as upstream:
+        results = fetch_departures(["de:09162:600"])
+        weather = WeatherService().get_weather()
+
+    departures = results["de:09162:600"]
+    assert any(dep["line"] == "189" for dep in departures)
+    # Recorded departures all lie within the next hour or so of "now"
+    now = time.time()
+    assert all(now - 60 < dep["time"] < now + 2 * 3600 for dep in departures)
+    assert weather["description_de"] == "Leichter Regen"
+    assert upstream.calls == {"mvg": 1, "openweather": 1}
+
+
+def test_injects_latency_and_errors():
+    upstream = ReplayUpstream(latency=0.05, error_rate=1.0)
+    start = time.perf_counter()
+    with pytest.raises(MvgApiError):
+        asyncio.run(upstream.departures_async("de:09162:600"))
+    assert time.perf_counter() - start >= 0.05
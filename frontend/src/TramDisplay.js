@@ -1,6 +1,6 @@
 async function fetchTramData() {
     try {
-        const response = await fetch('/api/trams');
+        const response = await fetch('/api/trams?fields=line,destination,minutes');
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
@@ -25,7 +25,7 @@ function displayTramData(data) {
         <ul>
             ${southbound.map(tram => `<li>Line ${tram.line} to ${tram.destination} in ${tram.minutes} minutes</li>`).join('')}
         </ul>
-        <p>Last updated: ${new Date(lastUpdated).toLocaleTimeString()}</p>
+        <p>Last updated: ${new Date(lastUpdated * 1000).toLocaleTimeString()}</p>
     `;
 }
 